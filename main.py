@@ -18,6 +18,7 @@ HOW IT WORKS:
 BEFORE YOU RUN THIS:
     Install audio support:
         sudo apt-get install python3-pyaudio -y
+        sudo apt-get install python3-numpy -y
         sudo pip3 install SpeechRecognition google-genai python-dotenv --break-system-packages
 
     Make sure you have a .env file with your API key:
@@ -39,10 +40,14 @@ except ImportError:
 from snowy.brain import SnowyBrain
 from snowy.hardware import SnowyBody
 from snowy.ears import SnowyEars
+from snowy.replay import SessionRecorder
+from snowy.snapshot import Snapshot
 
 
 def check_api_key():
     """Check the API key is set before we start. Friendly error if not."""
+    if os.environ.get("SNOWY_BRAIN_BACKEND") == "gateway":
+        return  # the brain gateway (snowy/gateway.py) holds the key
     if not os.environ.get("GEMINI_API_KEY"):
         print()
         print("ERROR: GEMINI_API_KEY not found!")
@@ -60,21 +65,26 @@ def check_api_key():
         raise SystemExit(1)
 
 
-def _show_idle(body, brain):
+def _show_idle(body, brain, snapshot):
     """
     Show Snowy's idle screen. Eyes go red if quota is exhausted so you
-    can see at a glance whether she can answer questions or not.
+    can see at a glance whether she's using Gemini or her offline brain.
+    The screen and quota state are saved in the snapshot too.
     """
     if brain.quota_ok:
         body.show_face("Press my ear", "then speak!")
         body.set_eyes("curious")   # green = ready
     else:
-        body.show_face("No credits!", "Try tomorrow")
-        body.set_eyes("grumpy")    # red = quota exhausted
+        body.show_face("Press my ear", "(offline brain)")
+        body.set_eyes("grumpy")    # red = quota exhausted, answers offline
+
+    snapshot.save_quota(brain.quota_ok)
+    snapshot.save_display(body.face[0], body.face[1], body.eyes)
 
 
 def main():
     """The main program - Snowy comes to life here!"""
+    started = time.monotonic()
 
     # Step 0: Make sure the API key is ready
     check_api_key()
@@ -85,33 +95,68 @@ def main():
     print("=" * 35)
     print()
 
-    # Step 1: Wake up Snowy's brain (Gemini AI), ears (mic), and body (hardware)
+    # Step 1: Did Snowy only just stop (a crash or a restart)? If her
+    # snapshot is fresh, she can skip the slow start-up steps below.
+    snapshot = Snapshot()
+    state = snapshot.load()
+    warm = snapshot.is_fresh(state)
+
+    # Step 2: Wake up Snowy's brain (Gemini AI), ears (mic), and body (hardware)
     brain = SnowyBrain()
     body  = SnowyBody()
-    ears  = SnowyEars()   # This calibrates the mic - keep quiet for 1 second!
-
-    # Step 2: Startup greeting on the LCD
-    body.show_face("Hello! I am", "Snowy! ^..^")
-    body.set_eyes("happy")
-    time.sleep(2)
-
-    # Step 3: Check quota before showing idle screen.
-    # This makes sure the LED is red straight away if credits are exhausted,
-    # rather than showing green and only turning red on the first question.
-    body.show_face("Checking AI", "credits...")
-    body.set_eyes("thinking")
-    time.sleep(1)              # keep message visible while check runs
-    brain._check_quota_once()  # sets brain.quota_ok correctly
-    print(f"Startup quota check: {'OK' if brain.quota_ok else 'EXHAUSTED'}")
-
-    _show_idle(body, brain)
-    time.sleep(1)              # let the result (green/red) register visually
-
-    print("Snowy is ready!")
+    if warm and state["display"]:
+        # Put her face straight back how it was
+        body.show_face(state["display"]["line1"], state["display"]["line2"])
+        body.set_eyes(state["display"]["eyes"])
+    # On a cold start this calibrates the mic - keep quiet for 1 second!
+    ears  = SnowyEars(energy_threshold=state["noise"] if warm else None)
+
+    # Optional: record this session so it can be replayed on any computer
+    # (set SNOWY_RECORD=sessions in .env - see snowy/replay.py)
+    recorder = None
+    if os.environ.get("SNOWY_RECORD"):
+        recorder = SessionRecorder.in_folder(os.environ["SNOWY_RECORD"])
+        ears.recorder = brain.recorder = recorder
+        print(f"Recording this session to {recorder.path}")
+
+    if warm:
+        # Warm restart: carry on the conversation and trust the saved
+        # credits state - no greeting, no quota check, no waiting.
+        print("Warm restart - picking up where Snowy left off!")
+        brain.restore(state["turns"])
+        brain.quota_ok = state["quota_ok"]
+    else:
+        # Step 3: Startup greeting on the LCD
+        body.show_face("Hello! I am", "Snowy! ^..^")
+        body.set_eyes("happy")
+        time.sleep(2)
+
+        # Step 4: Check quota before showing idle screen.
+        # This makes sure the LED is red straight away if credits are exhausted,
+        # rather than showing green and only turning red on the first question.
+        body.show_face("Checking AI", "credits...")
+        body.set_eyes("thinking")
+        time.sleep(1)              # keep message visible while check runs
+        brain._check_quota_once()  # sets brain.quota_ok correctly
+        print(f"Startup quota check: {'OK' if brain.quota_ok else 'EXHAUSTED'}")
+
+    # Start this run's snapshot afresh with what Snowy knows right now
+    snapshot.compact({
+        "turns": state["turns"] if warm else [],
+        "noise": ears.energy_threshold,
+        "quota_ok": brain.quota_ok,
+        "display": None,
+    })
+
+    _show_idle(body, brain, snapshot)
+    if not warm:
+        time.sleep(1)          # let the result (green/red) register visually
+
+    print(f"Snowy is ready! (woke up in {time.monotonic() - started:.1f}s)")
     print("Press the ear button, then speak your question.")
     print("Press Ctrl+C at any time to shut Snowy down.\n")
 
-    # Step 3: Main loop - keep going until Ctrl+C
+    # Step 5: Main loop - keep going until Ctrl+C
     try:
         while True:
 
@@ -119,12 +164,8 @@ def main():
             print("Waiting for button press...")
             body.wait_for_button()
             print("Button pressed!")
-
-            # Short-circuit immediately if we already know quota is out -
-            # no point listening if we can't answer anyway.
-            if not brain.quota_ok:
-                _show_idle(body, brain)
-                continue
+            if recorder:
+                recorder.record("button")
 
             # --- LISTEN ---
             print("Listening...")
@@ -134,13 +175,14 @@ def main():
             # Record from the USB microphone and convert speech to text
             question = ears.listen(timeout=6, phrase_limit=8)
             print(f"Heard: {question!r}")
+            snapshot.save_noise(ears.energy_threshold)
 
             # If nothing was heard, go back to waiting
             if not question:
                 body.show_face("Hmm? I didn't", "catch that!")
                 body.set_eyes("sleepy")
                 time.sleep(2)
-                _show_idle(body, brain)
+                _show_idle(body, brain, snapshot)
                 continue
 
             # Show what Snowy heard (so you can check it was right!)
@@ -152,28 +194,31 @@ def main():
             body.blink_eyes("thinking", times=4, speed=0.3)
             print(f"Snowy is thinking about: {question!r}")
 
-            # Ask Gemini AI!
+            # Ask Gemini AI! (If Gemini can't answer, Snowy's offline brain
+            # does - brain.last_source says which one answered.)
+            # Gemini and quota errors never get this far - think() answers
+            # offline instead - so this only catches real surprises.
             try:
                 answer = brain.think(question)
             except Exception as err:
-                print(f"Error from Gemini: {err}")
+                print(f"Error while thinking: {err}")
                 body.set_eyes("grumpy")
-                if brain._is_quota_error(err):
-                    brain.quota_ok = False
-                    body.show_face("No credits!", "Try tomorrow")
-                else:
-                    body.show_face("Oops! Brain", "got confused!")
+                body.show_face("Oops! Brain", "got confused!")
                 time.sleep(2)
-                _show_idle(body, brain)
+                _show_idle(body, brain, snapshot)
                 continue
 
+            # Only Gemini's answers are part of its chat history
+            if brain.last_source == "gemini":
+                snapshot.save_turn(question, answer)
+
             # --- ANSWER ---
-            print(f"Snowy says: {answer}\n")
+            print(f"Snowy says ({brain.last_source}): {answer}\n")
             body.set_eyes("happy")
             body.scroll_text(answer, pause=2.5)
 
             # --- READY AGAIN ---
-            _show_idle(body, brain)
+            _show_idle(body, brain, snapshot)
 
     except KeyboardInterrupt:
         # Ctrl+C was pressed - time to sleep!
@@ -185,6 +230,8 @@ def main():
         body.set_eyes("sleepy")
         time.sleep(2)
         body.power_down()
+        if recorder:
+            recorder.close()
         print("Snowy is asleep. Goodnight!")
 
 
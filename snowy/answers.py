@@ -0,0 +1,81 @@
+"""
+snowy/answers.py - Snowy's notebook of answers she already knows!
+
+Kids ask the same questions again and again ("How fast is a cheetah?",
+"What do snow leopards eat?"). Asking Gemini every time is slow and
+uses up the free daily quota. So Snowy keeps a notebook: a small JSON
+file of questions and answers. If a question is already in the
+notebook, she answers instantly - no internet needed.
+
+The notebook is filled overnight by the batch runner:
+    python3 -m snowy.batch --warm
+
+The file lives at answers.json in the Snowy folder (change it with
+SNOWY_ANSWERS=/some/other/file.json in your .env file).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+
+def normalize(question: str) -> str:
+    """
+    Tidy a question so small differences don't matter.
+    "What's a SNOW leopard?" and "whats a snow leopard" both become
+    "whats a snow leopard".
+    """
+    question = question.lower().replace("'", "")
+    question = re.sub(r"[^a-z0-9]+", " ", question)
+    return question.strip()
+
+
+class AnswerStore:
+    """
+    A notebook of questions and answers, saved as a JSON file.
+
+    Usage:
+        store = AnswerStore()
+        store.put("What do you eat?", "Mostly blue sheep and ibex!")
+        store.save()
+        print(store.get("what do you eat"))   # same answer!
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("SNOWY_ANSWERS", "answers.json")
+        self._answers = {}
+        self._lock = threading.Lock()   # the batch runner writes from threads
+
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self._answers = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def get(self, question: str):
+        """Return the saved answer, or None if Snowy hasn't got one."""
+        entry = self._answers.get(normalize(question))
+        return entry["answer"] if entry else None
+
+    def put(self, question: str, answer: str):
+        """Write an answer into the notebook (call save() to keep it)."""
+        with self._lock:
+            self._answers[normalize(question)] = {
+                "question": question,
+                "answer": answer,
+                "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+    def save(self):
+        """
+        Save the notebook to disk. We write a temporary file first and
+        then swap it in, so a power cut can never leave half a notebook.
+        """
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._answers, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,193 @@
+"""
+snowy/audio.py - Gets Snowy's recordings ready to send to Google!
+
+Google's speech recognition only needs 16,000 samples per second of
+mono (one channel) audio to understand a voice. Most USB microphones
+record at 44,100 or 48,000 samples per second, so sending the raw
+recording means uploading about 3 times more data than needed.
+
+This file shrinks the recording BEFORE it is uploaded:
+  1. Downmix  - average all channels into one (mono)
+  2. Filter   - gently remove sounds too high-pitched to keep
+  3. Resample - pick out 16,000 samples for every second of audio
+  4. Encode   - pack the samples into bytes Google understands
+
+It all happens inside Python with NumPy (no external "flac" program),
+and it can run bit-by-bit WHILE Snowy is still recording, so the upload
+is ready the moment you stop talking.
+
+If the optional "soundfile" library is installed, recordings are packed
+as FLAC (smaller uploads). Otherwise they are sent as plain 16-bit
+samples ("L16"), which Google also accepts.
+"""
+
+import io
+import time
+import numpy as np
+
+try:
+    import soundfile  # Optional: lets us make FLAC without a subprocess
+except ImportError:
+    soundfile = None  # That's OK - we fall back to plain L16 samples
+
+
+# Google's speech recognition is happiest with 16 kHz mono audio.
+UPLOAD_RATE = 16000
+
+# How many numbers the "smoothing filter" uses. More = cleaner sound,
+# but more work for the Pi. 31 is plenty for speech.
+FILTER_TAPS = 31
+
+
+def _lowpass_filter(in_rate: int, out_rate: int) -> np.ndarray:
+    """
+    Build a small low-pass filter (a "windowed sinc").
+
+    When we throw away samples, any sound higher than half the new
+    sample rate would turn into ugly buzzing ("aliasing"). This filter
+    removes those high sounds first. Speech lives well below 8 kHz,
+    so nothing important is lost.
+    """
+    cutoff = 0.45 * out_rate / in_rate          # in cycles per input sample
+    n = np.arange(FILTER_TAPS) - (FILTER_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(FILTER_TAPS)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def _to_float(raw: bytes, sample_width: int) -> np.ndarray:
+    """Turn raw microphone bytes into numbers between -1.0 and 1.0."""
+    if sample_width == 1:
+        # 8-bit audio is unsigned: 128 means silence
+        data = np.frombuffer(raw, dtype=np.uint8).astype(np.float32)
+        return (data - 128) / 128
+    if sample_width == 2:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    if sample_width == 3:
+        # 24-bit audio: glue each 3 bytes into a 32-bit number
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        data = (b[:, 0] << 8) | (b[:, 1] << 16) | (b[:, 2] << 24)
+        return data.astype(np.float32) / 2**31
+    if sample_width == 4:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2**31
+    raise ValueError(f"Unsupported sample width: {sample_width}")
+
+
+class StreamEncoder:
+    """
+    Shrinks and packs audio, one chunk at a time.
+
+    Usage:
+        encoder = StreamEncoder(in_rate=48000, sample_width=2)
+        for chunk in recording:
+            encoder.feed(chunk)         # can be called while recording!
+        payload = encoder.finish()      # bytes ready to upload
+        print(encoder.content_type)     # e.g. "audio/l16; rate=16000"
+    """
+
+    def __init__(self, in_rate: int, sample_width: int = 2, channels: int = 1,
+                 out_rate: int = UPLOAD_RATE):
+        self.in_rate = in_rate
+        self.sample_width = sample_width
+        self.channels = channels
+        # Never "upsample" - if the mic is already slow, keep its rate
+        self.out_rate = min(out_rate, in_rate)
+
+        # Only filter when we are actually throwing samples away
+        if self.out_rate < in_rate:
+            self._taps = _lowpass_filter(in_rate, self.out_rate)
+        else:
+            self._taps = None
+        self._history = np.zeros(FILTER_TAPS - 1, dtype=np.float32)
+
+        # Resampling bookkeeping, so chunks join up seamlessly:
+        #   _step     = how many input samples per output sample
+        #   _seen     = how many (filtered) input samples we've had so far
+        #   _made     = how many output samples we've made so far
+        #   _prev     = the last input sample from the previous chunk
+        self._step = in_rate / self.out_rate
+        self._seen = 0
+        self._made = 0
+        self._prev = 0.0
+        self._leftover = b""   # half a frame left over from the last chunk
+
+        # Where the packed bytes go
+        self._buffer = io.BytesIO()
+        if soundfile is not None:
+            self.format = "flac"
+            self._flac = soundfile.SoundFile(
+                self._buffer, mode="w", samplerate=self.out_rate,
+                channels=1, format="FLAC", subtype="PCM_16",
+            )
+        else:
+            self.format = "l16"
+            self._flac = None
+
+        # Total time spent shrinking and packing (seconds)
+        self.encode_seconds = 0.0
+
+    @property
+    def content_type(self) -> str:
+        """The HTTP Content-Type header Google needs for this payload."""
+        if self.format == "flac":
+            return f"audio/x-flac; rate={self.out_rate}"
+        return f"audio/l16; rate={self.out_rate}"
+
+    def feed(self, raw: bytes):
+        """Shrink and pack one chunk of raw microphone audio."""
+        start = time.perf_counter()
+
+        # Only whole frames can be decoded - keep any spare bytes for later
+        frame_size = self.sample_width * self.channels
+        raw = self._leftover + raw
+        usable = len(raw) - len(raw) % frame_size
+        raw, self._leftover = raw[:usable], raw[usable:]
+        if not raw:
+            return
+
+        # Step 1: downmix to mono by averaging the channels
+        samples = _to_float(raw, self.sample_width)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+
+        # Step 2: low-pass filter (remembering the end of the last chunk)
+        if self._taps is not None:
+            joined = np.concatenate((self._history, samples))
+            self._history = joined[-(FILTER_TAPS - 1):]
+            samples = np.convolve(joined, self._taps, mode="valid")
+
+        # Step 3: resample by picking points between the input samples.
+        # Positions are counted from the very first sample of the
+        # recording, so there are no clicks where chunks meet.
+        first = self._seen - 1                 # index of self._prev
+        last = self._seen + len(samples) - 1   # index of final new sample
+        count = int(np.floor(last / self._step)) + 1 - self._made
+        if count > 0:
+            positions = (self._made + np.arange(count)) * self._step
+            known = np.arange(first, last + 1, dtype=np.float64)
+            values = np.concatenate(([self._prev], samples))
+            out = np.interp(positions, known, values)
+            self._made += count
+            self._write(out)
+        self._seen += len(samples)
+        self._prev = float(samples[-1])
+
+        self.encode_seconds += time.perf_counter() - start
+
+    def _write(self, samples: np.ndarray):
+        """Step 4: pack float samples as 16-bit numbers."""
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        if self._flac is not None:
+            self._flac.write(pcm)
+        else:
+            # L16 means 16-bit big-endian ("network order") samples
+            self._buffer.write(pcm.astype(">i2").tobytes())
+
+    def finish(self) -> bytes:
+        """Finish packing and return the bytes ready to upload."""
+        start = time.perf_counter()
+        if self._flac is not None:
+            self._flac.close()   # writes the FLAC ending
+        payload = self._buffer.getvalue()
+        self.encode_seconds += time.perf_counter() - start
+        return payload
+
@@ -0,0 +1,200 @@
+"""
+snowy/batch.py - Ask Snowy lots of questions without the microphone!
+
+Normally you talk to Snowy by pressing her ear. This tool reads a file of
+questions instead and asks them all, a few at a time, then writes down
+every answer - plus how long it took and how many tokens it used - as
+one line of JSON per question ("JSON lines").
+
+Ask every question in a file (one per line):
+    python3 -m snowy.batch questions.txt -o results.jsonl
+
+Fill Snowy's notebook overnight with the 100 questions kids ask most,
+so tomorrow she answers them instantly (see snowy/answers.py):
+    python3 -m snowy.batch --warm
+
+Try it without the internet (uses the pretend Gemini in stub_server.py):
+    python3 -m snowy.batch --warm --stub
+(The pretend answers go into a throwaway notebook, never the real one -
+otherwise Snowy would keep giving them even with Gemini back.)
+
+Free-tier Gemini only allows so many requests per minute, so the
+questions are spaced out to stay under --rpm (requests per minute).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from snowy.answers import AnswerStore
+from snowy.brain import SnowyBrain
+
+COMMON_QUESTIONS = os.path.join(os.path.dirname(__file__), "data",
+                                "common_questions.txt")
+
+
+class RateLimiter:
+    """
+    Spaces requests out evenly so we never go over the free-tier limit.
+    Each call to wait() blocks until it's this request's turn.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self._gap = 60.0 / requests_per_minute
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            turn = max(now, self._next)
+            self._next = turn + self._gap
+        time.sleep(turn - now)
+
+
+def read_questions(path: str) -> list:
+    """Read one question per line, skipping blanks and # comments."""
+    with open(path) as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def run_batch(questions: list, out_path: str, workers: int = 2,
+              rpm: float = 30, backend: str = None) -> list:
+    """
+    Ask every question and write one JSON line per answer to out_path.
+
+    Each worker thread gets its own SnowyBrain (and so its own connection).
+    If the daily quota runs out, the remaining questions are skipped.
+
+    returns: the list of result dicts, in the same order as questions
+    """
+    limiter = RateLimiter(rpm)
+    local = threading.local()
+    quota_out = threading.Event()
+    write_lock = threading.Lock()
+    results = [None] * len(questions)
+
+    with open(out_path, "w") as out:
+
+        def ask(index: int):
+            question = questions[index]
+            result = {"index": index, "question": question, "answer": None,
+                      "latency_ms": None, "input_tokens": None,
+                      "output_tokens": None, "error": None}
+
+            if quota_out.is_set():
+                result["error"] = "skipped: quota exhausted"
+            else:
+                if not hasattr(local, "brain"):
+                    # No quota poller - a quota error stops the batch
+                    local.brain = SnowyBrain(backend=backend,
+                                             poll_quota=False)
+                brain = local.brain
+
+                limiter.wait()
+                start = time.perf_counter()
+                try:
+                    result["answer"] = brain.think_once(question)
+                    result.update(brain.last_usage)
+                except Exception as err:
+                    result["error"] = str(err)
+                    if brain._is_quota_error(err):
+                        quota_out.set()
+                result["latency_ms"] = round(
+                    (time.perf_counter() - start) * 1000, 1)
+
+            with write_lock:
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+            results[index] = result
+            print(f"[{index + 1}/{len(questions)}] {question!r} -> "
+                  f"{result['answer'] or result['error']!r}")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() makes any unexpected exception show up here
+            list(pool.map(ask, range(len(questions))))
+
+    return results
+
+
+def print_summary(results: list):
+    """Print how fast Snowy was and how many tokens she used."""
+    ok = [r for r in results if r["answer"] is not None]
+    print()
+    print(f"Answered {len(ok)} of {len(results)} questions")
+    if not ok:
+        return
+    latencies = sorted(r["latency_ms"] for r in ok)
+    p90 = latencies[int(0.9 * (len(latencies) - 1))]
+    print(f"Latency: median {statistics.median(latencies):.0f} ms, "
+          f"90% under {p90:.0f} ms, slowest {latencies[-1]:.0f} ms")
+    tokens_in = sum(r["input_tokens"] or 0 for r in ok)
+    tokens_out = sum(r["output_tokens"] or 0 for r in ok)
+    print(f"Tokens: {tokens_in} in, {tokens_out} out")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ask Snowy's brain a file of questions, no mic needed.")
+    parser.add_argument("questions", nargs="?",
+                        help="text file with one question per line "
+                             "(default with --warm: the 100 common questions)")
+    parser.add_argument("-o", "--out", default="batch_results.jsonl",
+                        help="where to write the JSON lines results")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="how many questions to ask at the same time")
+    parser.add_argument("--rpm", type=float, default=30,
+                        help="max requests per minute (free tier: 30)")
+    parser.add_argument("--backend", choices=["sdk", "rest"],
+                        help="which Gemini backend to use")
+    parser.add_argument("--warm", action="store_true",
+                        help="save the answers into Snowy's notebook")
+    parser.add_argument("--stub", action="store_true",
+                        help="use the pretend Gemini instead of the real one")
+    args = parser.parse_args()
+
+    path = args.questions or (COMMON_QUESTIONS if args.warm else None)
+    if path is None:
+        parser.error("give a questions file (or use --warm)")
+    questions = read_questions(path)
+
+    # Load the API key from .env, just like main.py does
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    if args.stub:
+        from snowy.stub_server import StubGemini
+        stub = StubGemini()
+        os.environ["GEMINI_BASE_URL"] = stub.start()
+        os.environ.setdefault("GEMINI_API_KEY", "stub")
+        print(f"Using pretend Gemini at {os.environ['GEMINI_BASE_URL']}")
+        # Keep pretend answers out of Snowy's real notebook
+        os.environ["SNOWY_ANSWERS"] = os.path.join(tempfile.mkdtemp(),
+                                                   "answers.json")
+
+    results = run_batch(questions, args.out, workers=args.workers,
+                        rpm=args.rpm, backend=args.backend)
+    print_summary(results)
+    print(f"Results written to {args.out}")
+
+    if args.warm:
+        store = AnswerStore()
+        for result in results:
+            if result["answer"]:
+                store.put(result["question"], result["answer"])
+        store.save()
+        print(f"Snowy's notebook now knows {len(store)} answers "
+              f"({store.path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,13 +12,25 @@ How it works:
 
 One cool thing: Gemini's "chat" object remembers the conversation
 automatically - we don't have to do it ourselves!
+
+Snowy can talk to Gemini in three ways (pick one in your .env file):
+    SNOWY_BRAIN_BACKEND=sdk     Google's official google-genai library (default)
+    SNOWY_BRAIN_BACKEND=rest    Snowy's own tiny client (snowy/gemini_rest.py) -
+                                starts faster and uses less memory on the Pi
+    SNOWY_BRAIN_BACKEND=gateway Ask a brain gateway shared by several Snowys
+                                (snowy/gateway.py) instead of Gemini directly
+To test without the internet, set GEMINI_BASE_URL to a pretend Gemini
+(see snowy/stub_server.py).
 """
 
+import math
 import os
 import threading
 import time
-from google import genai
-from google.genai import types
+
+from snowy.answers import AnswerStore
+from snowy.lcd import LCD_COLS, LCD_ROWS, fit_to_pages
+from snowy.offline import OfflineBrain
 
 
 # ---------------------------------------------------------------
@@ -51,6 +63,41 @@ RULES FOR ANSWERING:
 """
 
 
+# ---------------------------------------------------------------
+# HOW LONG CAN AN ANSWER BE?
+# Answers scroll across the LCD one page (2 rows x 16 characters) at a
+# time. We pick how many pages an answer may use, and turn that into a
+# hard limit on how many "tokens" (word pieces) Gemini may write.
+# Shorter answers are quicker to make AND quicker to read!
+# ---------------------------------------------------------------
+ANSWER_PAGES = 4        # 4 pages = 128 characters, about 2 sentences
+CHARS_PER_TOKEN = 4     # English averages roughly 4 characters per token
+TOKEN_HEADROOM = 1.25   # a little extra so sentences can finish naturally
+
+# Gemini stops straight away if it starts a new paragraph -
+# an LCD answer never needs more than one.
+STOP_SEQUENCES = ["\n\n"]
+
+
+def _describe(response) -> dict:
+    """
+    The parts of a Gemini reply Snowy cares about, as a plain dict.
+    Works for replies from the official library and from gemini_rest.
+    """
+    # Why did Gemini stop? "STOP" = finished, "MAX_TOKENS" = cut off
+    candidates = response.candidates or [None]
+    reason = getattr(candidates[0], "finish_reason", None)
+    reason = getattr(reason, "value", reason)   # the SDK uses an enum
+
+    usage = response.usage_metadata
+    return {
+        "text": response.text or "",
+        "finish_reason": reason,
+        "input_tokens": usage.prompt_token_count if usage else None,
+        "output_tokens": usage.candidates_token_count if usage else None,
+    }
+
+
 class SnowyBrain:
     """
     Snowy's brain - this class connects to Google Gemini AI!
@@ -61,36 +108,147 @@ class SnowyBrain:
         print(answer)  # Snowy replies!
     """
 
-    def __init__(self):
+    def __init__(self, backend: str = None, pages: int = None, client=None,
+                 store: AnswerStore = None, offline: OfflineBrain = None,
+                 poll_quota: bool = True):
+        # Which way to talk to Gemini: "sdk", "rest" or "gateway"
+        # (see top of file)
+        self.backend = backend or os.environ.get("SNOWY_BRAIN_BACKEND", "sdk")
+
+        # How many LCD pages an answer may fill, and the matching limits
+        self.pages = pages or int(os.environ.get("SNOWY_ANSWER_PAGES",
+                                                 ANSWER_PAGES))
+        max_chars = self.pages * LCD_ROWS * LCD_COLS
+        self.max_output_tokens = math.ceil(
+            max_chars / CHARS_PER_TOKEN * TOKEN_HEADROOM)
+
         # Connect to Gemini with the API key from the environment
-        # (we load it from .env in main.py)
-        api_key = os.environ.get("GEMINI_API_KEY")
-        self.client = genai.Client(api_key=api_key)
+        # (we load it from .env in main.py). A ready-made client can be
+        # passed in instead, e.g. the replay client in replay.py.
+        self.client = client or self._make_client()
 
         # Which model to use, and Snowy's personality config.
         # gemini-2.0-flash-lite: potentially ~1500 requests/day free.
         # If this gives limit:0 after a daily reset, switch to gemini-2.5-flash (100/day).
+        # BUT: 2.5 models "think" first, and their thinking tokens count
+        # towards max_output_tokens - with Snowy's small budget the answer
+        # comes back empty (MAX_TOKENS) and the LCD just shows "...".
+        # So if you switch, also add "thinking_config": {"thinking_budget": 0}
+        # to the config below. This budget only suits models
+        # that don't think.
         self._model = "gemini-2.0-flash-lite"
-        self._config = types.GenerateContentConfig(
-            system_instruction=SNOWY_PERSONALITY,
-        )
+        self._config = {
+            "system_instruction": SNOWY_PERSONALITY + (
+                f"\n7. Your whole answer must fit in {max_chars} characters.\n"),
+            "max_output_tokens": self.max_output_tokens,
+            "stop_sequences": STOP_SEQUENCES,
+        }
 
         # Start a chat session - Gemini remembers the conversation for us!
         # No need to manually track messages like some other APIs.
-        self.chat = self.client.chats.create(
-            model=self._model,
-            config=self._config,
-        )
+        self.chat = self._new_chat()
+
+        # Snowy's notebook of answers she already knows (see answers.py).
+        # Filled overnight by: python3 -m snowy.batch --warm
+        # (The brain gateway passes in one notebook shared by every Snowy.)
+        self.store = store or AnswerStore()
+
+        # Snowy's little offline brain (see offline.py) - used when Gemini
+        # can't be reached or the daily quota has run out.
+        self.offline = offline or OfflineBrain()
+
+        # Where the last answer came from ("gemini", "store" or "offline"),
+        # and how many tokens it used (None if Gemini wasn't asked).
+        self.last_source = None
+        self.last_usage = None
+
+        # Running total of tokens used since Snowy woke up
+        self.tokens_used = {"input": 0, "output": 0}
+
+        # Optional SessionRecorder (see replay.py) - saves every question,
+        # Gemini's reply and how long it took, so it can be replayed later
+        self.recorder = None
 
         # quota_ok: True = we can answer questions, False = daily limit hit.
         # Updated immediately whenever think() succeeds or gets a 429.
         # A background thread polls every 30 min when quota is out, so the
         # LED recovers automatically once Google resets the quota.
+        # (With SNOWY_BRAIN_BACKEND=gateway the check just asks the
+        # gateway's quota ledger, which is free. Inside the gateway the
+        # poller is off - the gateway polls once for every Snowy.)
         self.quota_ok = True
-        self._start_quota_poller()
+        if poll_quota:
+            self._start_quota_poller()
 
         print("Snowy's brain is online! *purr*")
 
+    def _make_client(self):
+        """
+        Connect to Gemini using the chosen backend.
+
+        The imports happen in here (not at the top of the file) so the
+        big google-genai library is only loaded if we actually use it.
+        """
+        api_key = os.environ.get("GEMINI_API_KEY")
+        base_url = os.environ.get("GEMINI_BASE_URL")
+
+        if self.backend == "rest":
+            from snowy.gemini_rest import DEFAULT_BASE_URL, GeminiRestClient
+            return GeminiRestClient(api_key=api_key,
+                                    base_url=base_url or DEFAULT_BASE_URL)
+
+        if self.backend == "sdk":
+            from google import genai
+            http_options = {"base_url": base_url} if base_url else None
+            return genai.Client(api_key=api_key, http_options=http_options)
+
+        if self.backend == "gateway":
+            from snowy.gateway import GatewayClient
+            return GatewayClient()
+
+        raise ValueError(f"Unknown SNOWY_BRAIN_BACKEND: {self.backend!r} "
+                         "(use 'sdk', 'rest' or 'gateway')")
+
+    def _generation_config(self, config: dict = None):
+        """
+        Snowy's config (or another config dict) in the shape the backend
+        wants. The official library wants a GenerateContentConfig object;
+        our REST client is happy with a plain dict of the same names.
+        """
+        if config is None:
+            config = self._config
+        if self.backend == "sdk":
+            from google.genai import types
+            return types.GenerateContentConfig(**config)
+        return config
+
+    def _new_chat(self, turns=()):
+        """
+        Start a new chat session - empty, or carrying on from earlier
+        (question, answer) turns.
+        """
+        history = []
+        for question, answer in turns:
+            history.append({"role": "user", "parts": [{"text": question}]})
+            history.append({"role": "model", "parts": [{"text": answer}]})
+        if self.backend == "sdk":
+            from google.genai import types
+            history = [types.Content.model_validate(c) for c in history]
+
+        return self.client.chats.create(
+            model=self._model,
+            config=self._generation_config(),
+            history=history,
+        )
+
+    def restore(self, turns: list):
+        """
+        Carry on an earlier conversation, e.g. after a restart.
+        turns: list of (question, answer) pairs, oldest first
+        """
+        self.chat = self._new_chat(turns)
+        print(f"Snowy remembers {len(turns)} earlier questions.")
+
     def _is_quota_error(self, err: Exception) -> bool:
         """Returns True if this error means we've hit the daily quota."""
         msg = str(err)
@@ -103,9 +261,16 @@ class SnowyBrain:
         so this doesn't waste requests during normal use.
         """
         try:
+            if self.backend == "gateway":
+                # The gateway keeps ONE quota ledger for every Snowy -
+                # just ask it, instead of spending a request on Gemini
+                self.quota_ok = self.client.quota_ok()
+                return
             self.client.models.generate_content(
                 model=self._model,
                 contents="hi",
+                # One token is plenty - we only want to know if it works
+                config=self._generation_config({"max_output_tokens": 1}),
             )
             self.quota_ok = True
             print("Quota recovered! Snowy can answer questions again.")
@@ -133,22 +298,110 @@ class SnowyBrain:
         """
         Ask Snowy a question. She'll think and reply!
 
+        If the answer is already in Snowy's notebook she replies instantly.
+        If Gemini can't be reached (no internet, or no quota left) she
+        answers from her offline brain instead - she never just gives up.
+        brain.last_source tells you which: "store", "gemini" or "offline".
+
         question: what you want to ask Snowy
         returns: Snowy's answer as a string
         """
+        start = time.monotonic()
+        answer = self._think(question)
+        if self.recorder:
+            self.recorder.record("think", question=question, answer=answer,
+                                 source=self.last_source,
+                                 think_s=time.monotonic() - start)
+        return answer
+
+    def _think(self, question: str) -> str:
+        """The actual thinking - see think()."""
+        answer = self.store.get(question)
+        if answer:
+            self.last_source = "store"
+            self.last_usage = None
+            return answer
+
+        # No point trying Gemini if we already know the quota is out.
+        # (A gateway keeps the quota ledger itself - and may still know
+        # the answer from its shared notebook - so always ask it.)
+        if not self.quota_ok and self.backend != "gateway":
+            return self._think_offline(question)
+
         # Send the question to Gemini and get a reply
         # The chat object automatically remembers everything said so far
-        response = self.chat.send_message(question)
+        start = time.monotonic()
+        try:
+            response = self.chat.send_message(question)
+        except Exception as err:
+            if self.recorder:
+                self.recorder.record("gemini", question=question,
+                                     error=str(err),
+                                     latency_s=time.monotonic() - start)
+            print(f"Gemini didn't answer ({err}) - using offline brain")
+            if self._is_quota_error(err):
+                self.quota_ok = False
+            return self._think_offline(question)
+
+        if self.recorder:
+            self.recorder.record("gemini", question=question,
+                                 latency_s=time.monotonic() - start,
+                                 **_describe(response))
 
         # If we got here, it worked - quota is definitely OK
+        # (unless a gateway says its shared quota has run out)
+        self.quota_ok = getattr(response, "quota_ok", True)
+        return self._finish(response)
+
+    def _think_offline(self, question: str) -> str:
+        """Answer from the offline brain (takes a few milliseconds)."""
+        self.last_source = "offline"
+        self.last_usage = None
+        return fit_to_pages(self.offline.answer(question), self.pages)
+
+    def think_once(self, question: str) -> str:
+        """
+        Ask Gemini a one-off question, in character but WITHOUT the chat
+        history (and without checking the notebook). Used by the batch
+        runner so every answer stands on its own.
+        """
+        response = self.client.models.generate_content(
+            model=self._model,
+            contents=question,
+            config=self._generation_config(),
+        )
         self.quota_ok = True
-        return response.text
+        return self._finish(response)
+
+    def _finish(self, response) -> str:
+        """
+        Tidy up Gemini's reply and write down how many tokens it used.
+
+        If Gemini ran out of tokens mid-sentence, or the answer is too
+        long for the LCD pages, it is trimmed at the end of a sentence.
+        """
+        reply = _describe(response)
+        text = reply["text"]
+        reason = reply["finish_reason"]
+        answer = fit_to_pages(text, self.pages,
+                              cut_off=(reason == "MAX_TOKENS"))
+
+        # A gateway says where its answer came from; otherwise it's Gemini
+        self.last_source = getattr(response, "source", "gemini")
+        self.last_usage = {
+            "input_tokens": reply["input_tokens"],
+            "output_tokens": reply["output_tokens"],
+            "finish_reason": reason,
+            "trimmed": answer != " ".join(text.split()),
+        }
+        self.tokens_used["input"] += self.last_usage["input_tokens"] or 0
+        self.tokens_used["output"] += self.last_usage["output_tokens"] or 0
+        print(f"Tokens: {self.last_usage['input_tokens']} in, "
+              f"{self.last_usage['output_tokens']} out ({reason})")
+        return answer
 
     def forget(self):
         """Snowy forgets everything - fresh conversation!"""
         # Start a brand new chat session with empty history
-        self.chat = self.client.chats.create(
-            model=self._model,
-            config=self._config,
-        )
+        self.chat = self._new_chat()
         print("Snowy's memory cleared. Fresh start!")
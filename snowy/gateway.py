@@ -0,0 +1,641 @@
+"""
+snowy/gateway.py - One shared brain for a whole family of Snowys!
+
+If you have several Snowys on the same network, each one normally talks
+to Gemini on its own: its own connection, its own quota checks, its own
+notebook of answers. They all share ONE daily quota though - so when
+three kids ask three Snowys "what's your name?" at the same time, that's
+three requests gone.
+
+The brain gateway fixes that. It's a little server that runs on one
+computer (a Pi is fine) and does the thinking for every Snowy:
+  - ONE pool of kept-alive connections to Gemini for everybody
+  - if two Snowys ask the same thing at the same moment, Gemini is
+    only asked once and both get the answer ("coalescing")
+  - ONE notebook of answers (answers.json) and ONE offline brain
+  - ONE quota ledger: it counts today's requests, and when the quota
+    runs out every Snowy switches to her offline brain together
+  - fair turns: questions wait in a queue per Snowy, and the queues
+    take turns - so one chatty Snowy can't hog the gateway
+Each Snowy still has her own conversation (her own chat history).
+
+Start the gateway:
+    python3 -m snowy.gateway --port 8770
+Or test it with no internet, using a pretend Gemini (see stub_server.py):
+    python3 -m snowy.gateway --stub
+
+Then on every Snowy, add to the .env file:
+    SNOWY_BRAIN_BACKEND=gateway
+    SNOWY_GATEWAY_URL=http://192.168.1.20:8770   (the gateway computer)
+    SNOWY_DEVICE_ID=kitchen-snowy                (optional - the Pi's name
+                                                  is used if you skip it)
+
+The gateway speaks plain JSON over HTTP:
+    POST /think   {"device", "question", "history"?}
+                  -> {"answer", "source", "quota_ok", "input_tokens",
+                      "output_tokens", "finish_reason"}
+    POST /forget  {"device"}                       -> {"ok": true}
+    POST /ask     {"device", "question"}
+                  -> a Gemini-shaped reply (a one-off question, asked
+                     with the gateway's own model and Snowy's config)
+    GET  /status  -> devices, quota, requests today, questions waiting
+                     (POST works too - that's how a Snowy checks quota)
+"history" is a list of [question, answer] turns - a Snowy sends it with
+her first question so the gateway carries on her conversation.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from snowy.answers import AnswerStore, normalize
+from snowy.brain import SnowyBrain
+from snowy.gemini_rest import (DEFAULT_BASE_URL, GeminiError, GeminiResponse,
+                               GeminiRestClient)
+from snowy.lcd import fit_to_pages
+from snowy.offline import OfflineBrain
+
+DEFAULT_PORT = 8770
+DEFAULT_GATEWAY_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+
+# How many questions the gateway sends to Gemini at the same time
+DEFAULT_WORKERS = 4
+
+
+# ---------------------------------------------------------------
+# THE GATEWAY (runs on one computer)
+# ---------------------------------------------------------------
+
+class FairQueue:
+    """
+    Questions waiting for Gemini, one queue per Snowy.
+
+    The queues take turns ("round robin"): after a Snowy's question is
+    picked, she goes to the back of the line. A Snowy only has one
+    question with Gemini at a time, so her chat history stays in order.
+
+    Usage:
+        queue.put("kitchen-snowy", job)
+        device, job = queue.get()     # waits for a job
+        ... do the job ...
+        queue.done(device)
+    """
+
+    def __init__(self):
+        self._queues = OrderedDict()   # device -> deque of jobs
+        self._busy = set()             # devices with a job being done
+        self._ready = threading.Condition()
+
+    def put(self, device: str, job):
+        with self._ready:
+            self._queues.setdefault(device, deque()).append(job)
+            self._ready.notify()
+
+    def get(self):
+        """Wait for the next job, taking turns between devices."""
+        with self._ready:
+            while True:
+                for device, jobs in self._queues.items():
+                    if jobs and device not in self._busy:
+                        self._busy.add(device)
+                        self._queues.move_to_end(device)   # back of the line
+                        return device, jobs.popleft()
+                self._ready.wait()
+
+    def done(self, device: str):
+        """A device's job is finished - its next job may go."""
+        with self._ready:
+            self._busy.discard(device)
+            if not self._queues.get(device):
+                self._queues.pop(device, None)
+            self._ready.notify_all()
+
+    def waiting(self) -> int:
+        """How many jobs are waiting."""
+        with self._ready:
+            return sum(len(jobs) for jobs in self._queues.values())
+
+
+class QuotaLedger:
+    """
+    Keeps track of the ONE Gemini quota every Snowy shares.
+
+    .ok          - False once Gemini said the quota ran out
+    .used_today  - requests sent to Gemini today
+    daily_limit  - optional: stop at this many requests a day, before
+                   Gemini has to say no (e.g. 1400 for a 1500/day quota)
+    """
+
+    def __init__(self, daily_limit: int = None):
+        self.daily_limit = daily_limit
+        self.ok = True
+        self.used_today = 0
+        self._day = date.today()
+        self._lock = threading.Lock()
+
+    def _new_day(self):
+        """Start counting again when the date changes (caller holds lock)."""
+        if date.today() != self._day:
+            self._day = date.today()
+            self.used_today = 0
+
+    def allows(self) -> bool:
+        """May we send another request to Gemini?"""
+        with self._lock:
+            self._new_day()
+            if self.daily_limit is not None and self.used_today >= self.daily_limit:
+                return False
+            return self.ok
+
+    def spent(self):
+        """Gemini answered - count it. (So the quota must be OK.)"""
+        with self._lock:
+            self._new_day()
+            self.used_today += 1
+            self.ok = True
+
+    def exhausted(self):
+        """Gemini said the quota has run out."""
+        with self._lock:
+            self.ok = False
+
+
+class BrainGateway:
+    """
+    Thinks for a whole family of Snowys (see the top of this file).
+
+    Usage:
+        gateway = BrainGateway()
+        url = gateway.start(port=8770)
+        ... Snowys ask questions at url ...
+        gateway.stop()
+
+    client:      the Gemini client to share (default: gemini_rest, set up
+                 from GEMINI_API_KEY and GEMINI_BASE_URL)
+    workers:     how many questions go to Gemini at the same time
+    daily_limit: optional cap on requests per day (see QuotaLedger)
+    """
+
+    def __init__(self, client=None, workers: int = DEFAULT_WORKERS,
+                 daily_limit: int = None):
+        self.client = client or GeminiRestClient(
+            api_key=os.environ.get("GEMINI_API_KEY"),
+            base_url=os.environ.get("GEMINI_BASE_URL") or DEFAULT_BASE_URL,
+            max_connections=workers)
+
+        # Shared by every Snowy
+        self.store = AnswerStore()
+        self.offline = OfflineBrain()
+        self.ledger = QuotaLedger(daily_limit)
+        self.queue = FairQueue()
+
+        self.coalesced = 0        # questions answered by someone else's request
+        self._brains = {}         # device -> her SnowyBrain (her conversation)
+        self._in_flight = {}      # question key -> Future with the answer
+        self._lock = threading.Lock()
+        self._server = None
+
+        # A spare brain for quota checks and the default model name
+        self._prober = self._new_brain()
+
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+        self._start_quota_poller()
+
+    def _new_brain(self) -> SnowyBrain:
+        """A SnowyBrain using the shared client, notebook and offline brain."""
+        return SnowyBrain(backend="rest", client=self.client,
+                          store=self.store, offline=self.offline,
+                          poll_quota=False)
+
+    def _brain(self, device: str) -> SnowyBrain:
+        """The brain holding this device's conversation (made on first use)."""
+        with self._lock:
+            if device not in self._brains:
+                self._brains[device] = self._new_brain()
+                print(f"New Snowy joined the gateway: {device}")
+            return self._brains[device]
+
+    # --- the workers, which take jobs from the fair queue ---
+
+    def _work(self):
+        while True:
+            device, (job, future) = self.queue.get()
+            try:
+                future.set_result(job())
+            except Exception as err:
+                future.set_exception(err)
+            finally:
+                self.queue.done(device)
+
+    def _coalesce(self, key, device: str, job):
+        """
+        Run job through the fair queue - unless the very same question is
+        already on its way to Gemini, in which case wait for that answer.
+
+        returns: (result, True if this call ran the job itself)
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            def finished(_):
+                with self._lock:
+                    self._in_flight.pop(key, None)
+            future.add_done_callback(finished)
+            self.queue.put(device, (job, future))
+        return future.result(), leader
+
+    # --- what the Snowys can ask for ---
+
+    def think(self, device: str, question: str, history: list = None) -> dict:
+        """
+        Answer a question in this device's conversation.
+        history: [question, answer] turns to carry on from (optional)
+        """
+        brain = self._brain(device)
+
+        # Notebook and offline answers take milliseconds - give them
+        # straight away. Only real Gemini questions wait in the queue.
+        reply = self._answer_locally(brain, question, history)
+        if reply:
+            return reply
+
+        # Only questions asked in the same spot of the same conversation
+        # get the same answer - "why?" means different things in
+        # different chats! So the key includes the last turn.
+        if history is not None:
+            last = history[-1] if history else ["", ""]
+        else:
+            turns = brain.chat.get_history()[-2:]
+            last = ["".join(p.get("text", "") for p in turn["parts"])
+                    for turn in turns] or ["", ""]
+        key = ("think", normalize(question),
+               normalize(last[0]), normalize(last[1]))
+
+        reply, leader = self._coalesce(
+            key, device, lambda: self._run_think(brain, question, history))
+
+        if not leader:
+            # Another Snowy asked first - add her answer to this chat too
+            if history is not None:
+                brain.restore(history)
+            if reply["source"] == "gemini":
+                brain.chat.remember(question, reply["answer"])
+            # The tokens were spent (and counted) by the first Snowy
+            reply = dict(reply, input_tokens=0, output_tokens=0,
+                         coalesced=True)
+        return reply
+
+    def _answer_locally(self, brain: SnowyBrain, question: str,
+                        history: list = None) -> dict:
+        """
+        Answer from the shared notebook, or from the offline brain if the
+        shared quota is out. returns: the reply, or None if Gemini is needed
+        """
+        answer = self.store.get(question)
+        source = "store"
+        if not answer and not self.ledger.allows():
+            answer = fit_to_pages(self.offline.answer(question), brain.pages)
+            source = "offline"
+        if not answer:
+            return None
+
+        # Still carry on the right conversation next time Gemini is asked
+        if history is not None:
+            brain.restore(history)
+        return {"answer": answer, "source": source,
+                "quota_ok": self.ledger.allows()}
+
+    def _run_think(self, brain: SnowyBrain, question: str,
+                   history: list = None) -> dict:
+        """A queued think job (runs on a worker)."""
+        if history is not None:
+            brain.restore(history)
+
+        allowed = self.ledger.allows()
+        brain.quota_ok = allowed
+        answer = brain.think(question)
+        if brain.last_source == "gemini":
+            self.ledger.spent()
+        elif allowed and not brain.quota_ok:
+            self.ledger.exhausted()    # Gemini said no - tell every Snowy
+
+        reply = {"answer": answer, "source": brain.last_source,
+                 "quota_ok": self.ledger.allows()}
+        reply.update(brain.last_usage or {})
+        return reply
+
+    def forget(self, device: str):
+        """Clear this device's conversation."""
+        self._brain(device).forget()
+
+    def ask(self, device: str, question: str) -> dict:
+        """
+        A one-off question with no conversation. Raises GeminiError 429
+        straight away if the shared quota is known to be out - no need
+        to bother Gemini.
+
+        The model and config are always the gateway's own (Snowy's
+        personality and LCD-sized token budget), never the caller's -
+        anyone on the network can reach the gateway, and it's the whole
+        family's quota.
+        """
+        if not self.ledger.allows():
+            raise GeminiError(429, "RESOURCE_EXHAUSTED",
+                              "The gateway's shared quota has run out.")
+        reply, _ = self._coalesce(("ask", question), device,
+                                  lambda: self._run_ask(question))
+        return reply
+
+    def _run_ask(self, question: str) -> dict:
+        """A queued one-off question (runs on a worker)."""
+        try:
+            response = self.client.models.generate_content(
+                model=self._prober._model, contents=question,
+                config=self._prober._generation_config())
+        except Exception as err:
+            if self._prober._is_quota_error(err):
+                self.ledger.exhausted()
+            raise
+        self.ledger.spent()
+        return response.data
+
+    def status(self) -> dict:
+        with self._lock:
+            devices = sorted(self._brains)
+        return {
+            "devices": devices,
+            "quota_ok": self.ledger.allows(),
+            "requests_today": self.ledger.used_today,
+            "daily_limit": self.ledger.daily_limit,
+            "coalesced": self.coalesced,
+            "waiting": self.queue.waiting(),
+        }
+
+    def _start_quota_poller(self):
+        """
+        ONE background check for everybody: every 30 minutes, if the quota
+        is out, see if Google has reset it.
+        """
+        def loop():
+            while True:
+                time.sleep(30 * 60)
+                if not self.ledger.ok:
+                    print("Polling quota status...")
+                    self._prober.quota_ok = False
+                    self._prober._check_quota_once()
+                    if self._prober.quota_ok:
+                        self.ledger.spent()
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    # --- the web server ---
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0, host: str = "127.0.0.1") -> str:
+        """Start serving in the background. Returns the base URL."""
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.gateway = self
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.client.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles one request from a Snowy."""
+
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # send small replies straight away
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.server.gateway.status())
+        else:
+            self._send_error(404, "NOT_FOUND", f"No such page: {self.path}")
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "INVALID_ARGUMENT", "Body must be JSON")
+            return
+        # No device name? Then each computer counts as one Snowy
+        device = body.get("device") or self.client_address[0]
+
+        try:
+            if self.path == "/think":
+                reply = gateway.think(device, body["question"],
+                                      body.get("history"))
+            elif self.path == "/forget":
+                gateway.forget(device)
+                reply = {"ok": True}
+            elif self.path == "/ask":
+                reply = gateway.ask(device, body["question"])
+            elif self.path == "/status":
+                reply = gateway.status()
+            else:
+                self._send_error(404, "NOT_FOUND", f"No such page: {self.path}")
+                return
+        except KeyError as err:
+            self._send_error(400, "INVALID_ARGUMENT", f"Missing {err}")
+        except GeminiError as err:
+            self._send_error(err.code, err.status, err.message)
+        except Exception as err:
+            self._send_error(502, "BAD_GATEWAY", str(err))
+        else:
+            self._send_json(200, reply)
+
+    def _send_error(self, code: int, status: str, message: str):
+        # Same shape as Gemini's errors, so GeminiRestClient understands
+        self._send_json(code, {"error": {"code": code, "status": status,
+                                         "message": message}})
+
+    def _send_json(self, code: int, data: dict):
+        payload = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Keep the terminal quiet
+
+
+# ---------------------------------------------------------------
+# THE SNOWY SIDE (SNOWY_BRAIN_BACKEND=gateway)
+# ---------------------------------------------------------------
+
+def _turns(history: list) -> list:
+    """Turn chat history (JSON-style dicts) into [question, answer] pairs."""
+    texts = ["".join(p.get("text", "") for p in content["parts"])
+             for content in history or []]
+    return [[texts[i], texts[i + 1]] for i in range(0, len(texts) - 1, 2)]
+
+
+class GatewayClient(GeminiRestClient):
+    """
+    Looks like a Gemini client to SnowyBrain (chats + models), but
+    asks the brain gateway instead.
+
+    Usage:
+        brain = SnowyBrain(backend="gateway")   # makes one of these
+
+    url:    the gateway (default: SNOWY_GATEWAY_URL from .env)
+    device: this Snowy's name (default: SNOWY_DEVICE_ID, or the Pi's name)
+    """
+
+    def __init__(self, url: str = None, device: str = None,
+                 timeout: float = 60):
+        url = url or os.environ.get("SNOWY_GATEWAY_URL", DEFAULT_GATEWAY_URL)
+        # The gateway may have to queue a question - so wait a bit longer
+        super().__init__(api_key="", base_url=url, timeout=timeout)
+        self._gateway_path = urlsplit(url).path.rstrip("/")
+        self.device = (device or os.environ.get("SNOWY_DEVICE_ID")
+                       or socket.gethostname())
+        self.chats = _GatewayChats(self)
+        self.models = _GatewayModels(self)
+
+    def call(self, action: str, **data) -> dict:
+        """Send one request to the gateway, e.g. call("think", question=...)"""
+        data["device"] = self.device
+        return self.post_json(f"{self._gateway_path}/{action}", data)
+
+    def quota_ok(self) -> bool:
+        """Does the gateway's shared quota ledger say Gemini can be used?"""
+        return self.call("status")["quota_ok"]
+
+
+class GatewayChat:
+    """
+    This Snowy's conversation, kept on the gateway. The history is sent
+    along with the first question (after a restart or forget()), so the
+    gateway carries on from exactly the right place.
+    """
+
+    def __init__(self, client: GatewayClient, history: list = None):
+        self._client = client
+        self._turns = _turns(history)
+        self._synced = False
+
+    def send_message(self, message: str) -> GeminiResponse:
+        data = {"question": message}
+        if not self._synced:
+            data["history"] = self._turns
+        reply = self._client.call("think", **data)
+        self._synced = True
+        if reply["source"] == "gemini":
+            self._turns.append([message, reply["answer"]])
+
+        # Dress the reply up like Gemini's, so SnowyBrain can read it.
+        # The gateway already trimmed the answer to fit, so it's "STOP".
+        response = GeminiResponse({
+            "candidates": [{
+                "content": {"parts": [{"text": reply["answer"]}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {
+                "promptTokenCount": reply.get("input_tokens"),
+                "candidatesTokenCount": reply.get("output_tokens"),
+            },
+        })
+        response.source = reply["source"]
+        response.quota_ok = reply["quota_ok"]
+        return response
+
+    def get_history(self) -> list:
+        history = []
+        for question, answer in self._turns:
+            history.append({"role": "user", "parts": [{"text": question}]})
+            history.append({"role": "model", "parts": [{"text": answer}]})
+        return history
+
+
+class _GatewayChats:
+    """client.chats - makes new conversations."""
+
+    def __init__(self, client: GatewayClient):
+        self._client = client
+
+    def create(self, model: str, config: dict = None,
+               history: list = None) -> GatewayChat:
+        # The gateway picks the model and Snowy's personality itself
+        return GatewayChat(self._client, history)
+
+
+class _GatewayModels:
+    """client.models - one-off questions, through the gateway."""
+
+    def __init__(self, client: GatewayClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str,
+                         config: dict = None) -> GeminiResponse:
+        # The gateway picks the model and config itself
+        return GeminiResponse(self._client.call("ask", question=contents))
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(
+        description="Shared brain gateway for several Snowys")
+    parser.add_argument("--host", default="0.0.0.0",
+                        help="where to listen (0.0.0.0 = the whole network)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="questions sent to Gemini at the same time")
+    parser.add_argument("--daily-limit", type=int, default=None,
+                        help="stop using Gemini after this many requests a day")
+    parser.add_argument("--stub", action="store_true",
+                        help="use a pretend Gemini (no internet needed)")
+    args = parser.parse_args()
+
+    stub = None
+    if args.stub:
+        from snowy.stub_server import StubGemini
+        stub = StubGemini()
+        os.environ["GEMINI_BASE_URL"] = stub.start()
+        print(f"Using pretend Gemini at {stub.url}")
+
+    gateway = BrainGateway(workers=args.workers, daily_limit=args.daily_limit)
+    url = gateway.start(port=args.port, host=args.host)
+    print(f"Brain gateway listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gateway.stop()
+        if stub:
+            stub.stop()
@@ -0,0 +1,340 @@
+"""
+snowy/gemini_rest.py - A tiny Gemini client that talks to Google directly!
+
+The official google-genai library is great, but it is BIG: importing it
+also loads pydantic, httpx and hundreds of generated classes. On a
+Raspberry Pi 3B with 1 GB of memory that makes Snowy slow to wake up
+and uses lots of RAM - and Snowy only needs three things from it:
+  - chats.create()           (start a conversation)
+  - chat.send_message()      (ask a question in that conversation)
+  - models.generate_content() (ask a one-off question)
+
+This file does those three things using only Python's built-in modules.
+It sends plain JSON to Gemini's "generateContent" web API and keeps its
+connection open between questions (a "keep-alive" connection), so each
+new question skips the slow connect + TLS handshake.
+
+It copies the names the official library uses, so SnowyBrain can use
+either one. Pick this one by adding to your .env file:
+    SNOWY_BRAIN_BACKEND=rest
+"""
+
+import http.client
+import json
+import threading
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+
+# Where Gemini lives on the internet, and which version of its API we use
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+API_VERSION = "v1beta"
+
+
+# Errors that mean a kept-alive connection was closed while Snowy was
+# idle - worth one more try on a fresh connection. (NOT timeouts!)
+_STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError,
+                 BrokenPipeError)
+
+
+class GeminiError(Exception):
+    """
+    Gemini said no! Holds the HTTP code (e.g. 429) and status
+    (e.g. "RESOURCE_EXHAUSTED") so SnowyBrain can spot quota errors.
+    """
+
+    def __init__(self, code: int, status: str, message: str):
+        self.code = code
+        self.status = status
+        self.message = message
+        super().__init__(f"{code} {status}. {message}")
+
+
+class GeminiResponse:
+    """
+    One reply from Gemini (or one piece of a streamed reply).
+
+    .text            - the words Gemini wrote
+    .candidates      - .candidates[0].finish_reason says why Gemini
+                       stopped, e.g. "STOP" or "MAX_TOKENS"
+    .usage_metadata  - how many tokens the question and answer used
+                       (same names as the official library)
+    .data            - the full JSON reply, in case you need more
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+        candidates = data.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        self.text = "".join(part.get("text", "") for part in parts)
+        self.candidates = [
+            SimpleNamespace(finish_reason=candidates[0].get("finishReason")),
+        ]
+
+        usage = data.get("usageMetadata", {})
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=usage.get("promptTokenCount"),
+            candidates_token_count=usage.get("candidatesTokenCount"),
+            total_token_count=usage.get("totalTokenCount"),
+        )
+
+
+def _camel(name: str) -> str:
+    """Turn "max_output_tokens" into "maxOutputTokens" (what the API wants)."""
+    first, *rest = name.split("_")
+    return first + "".join(word.title() for word in rest)
+
+
+def _user_content(text: str) -> dict:
+    """Wrap a question in the JSON shape Gemini expects."""
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def _build_body(contents: list, config: dict = None) -> dict:
+    """
+    Build the JSON request body.
+
+    config uses the same names as the official GenerateContentConfig,
+    e.g. {"system_instruction": "...", "max_output_tokens": 60}
+    """
+    body = {"contents": contents}
+    config = dict(config or {})
+    system = config.pop("system_instruction", None)
+    if system:
+        body["systemInstruction"] = {"parts": [{"text": system}]}
+    if config:
+        body["generationConfig"] = {_camel(k): v for k, v in config.items()}
+    return body
+
+
+class GeminiRestClient:
+    """
+    Talks to Gemini over kept-alive HTTPS connections.
+
+    Usage:
+        client = GeminiRestClient(api_key="AIza...")
+        chat = client.chats.create(model="gemini-2.0-flash-lite",
+                                   config={"system_instruction": "Be Snowy"})
+        print(chat.send_message("Hello!").text)
+
+    base_url can point at a local test server, e.g. "http://127.0.0.1:8765"
+
+    max_connections: how many questions may be on their way to Gemini at
+    the same time. One is plenty for a single Snowy; the brain gateway
+    (see gateway.py) shares one client between many Snowys and uses more.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL,
+                 timeout: float = 30, max_connections: int = 1):
+        self._api_key = api_key or ""
+        self._timeout = timeout
+
+        parts = urlsplit(base_url)
+        self._tls = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/") + "/" + API_VERSION
+
+        # A little "pool" of kept-alive connections. Each question borrows
+        # one and gives it back afterwards, so two threads (e.g. the quota
+        # poller and a question) never talk over each other on the same
+        # connection. _slots stops more than max_connections being open.
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+
+        # Same layout as the official library: client.chats / client.models
+        self.chats = _Chats(self)
+        self.models = _Models(self)
+
+    def _connect(self):
+        """Open a fresh connection to Gemini."""
+        if self._tls:
+            return http.client.HTTPSConnection(
+                self._host, self._port, timeout=self._timeout)
+        return http.client.HTTPConnection(
+            self._host, self._port, timeout=self._timeout)
+
+    def _borrow(self):
+        """Take a kept-alive connection from the pool (or open a new one)."""
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _give_back(self, conn, reusable: bool):
+        """Return a connection to the pool - or hang it up if it's muddled."""
+        if reusable:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def _send(self, conn, path: str, body: dict):
+        """
+        POST a request and return (connection, HTTP response).
+
+        If the kept-alive connection was quietly closed by the server
+        while Snowy was idle, reconnect and try once more - which is why
+        the (maybe new) connection is handed back too.
+        """
+        payload = json.dumps(body).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "x-goog-api-key": self._api_key,
+        }
+        for attempt in range(2):
+            try:
+                conn.request("POST", path, payload, headers)
+                return conn, conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if attempt == 1:
+                    raise
+                conn = self._connect()
+            except (http.client.HTTPException, OSError):
+                # e.g. a timeout - the server is there but stuck, so
+                # trying again would only keep Snowy waiting twice as long
+                conn.close()
+                raise
+
+    def _error(self, response, raw: bytes) -> GeminiError:
+        """Turn an error reply into a GeminiError."""
+        try:
+            error = json.loads(raw)["error"]
+            status = error.get("status", "")
+            message = error.get("message", "")
+        except (ValueError, KeyError, TypeError):
+            status, message = response.reason, raw.decode("utf-8", "replace")
+        return GeminiError(response.status, status, message)
+
+    def post_json(self, path: str, body: dict) -> dict:
+        """
+        POST some JSON to `path` and return the JSON reply.
+        Raises GeminiError if the server says no.
+        """
+        conn = self._borrow()
+        reusable = False
+        try:
+            conn, response = self._send(conn, path, body)
+            raw = response.read()
+            reusable = True
+            if response.status != 200:
+                raise self._error(response, raw)
+            return json.loads(raw)
+        finally:
+            self._give_back(conn, reusable)
+
+    def generate(self, model: str, body: dict) -> GeminiResponse:
+        """Send a request and wait for the whole reply."""
+        path = f"{self._prefix}/models/{model}:generateContent"
+        return GeminiResponse(self.post_json(path, body))
+
+    def generate_stream(self, model: str, body: dict):
+        """
+        Send a request and yield the reply in pieces as Gemini writes it.
+        Gemini sends "server-sent events": lines starting with "data: ".
+        """
+        path = f"{self._prefix}/models/{model}:streamGenerateContent?alt=sse"
+        conn = self._borrow()
+        reusable = False
+        try:
+            conn, response = self._send(conn, path, body)
+            if response.status != 200:
+                raw = response.read()
+                reusable = True
+                raise self._error(response, raw)
+            for line in response:
+                if line.startswith(b"data:"):
+                    yield GeminiResponse(json.loads(line[5:]))
+            response.read()  # finish the reply so the connection is reusable
+            reusable = True
+        finally:
+            # Stopped reading half way? Then the connection is in a
+            # muddle - _give_back throws it away instead of keeping it.
+            self._give_back(conn, reusable)
+
+    def close(self):
+        """Hang up the kept-alive connections."""
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+class GeminiRestChat:
+    """
+    A conversation. Remembers everything said so far (the "history")
+    and sends it along with every new question.
+    """
+
+    def __init__(self, client: GeminiRestClient, model: str,
+                 config: dict = None, history: list = None):
+        self._client = client
+        self._model = model
+        self._config = config
+        self._history = list(history or [])
+
+    def send_message(self, message: str) -> GeminiResponse:
+        """Ask a question and wait for the whole answer."""
+        question = _user_content(message)
+        body = _build_body(self._history + [question], self._config)
+        response = self._client.generate(self._model, body)
+        self._remember(question, response.text)
+        return response
+
+    def remember(self, question: str, answer: str):
+        """
+        Add a question + answer to the history without asking Gemini,
+        e.g. when another Snowy already asked the very same thing.
+        """
+        self._remember(_user_content(question), answer)
+
+    def send_message_stream(self, message: str):
+        """Ask a question and yield the answer in pieces."""
+        question = _user_content(message)
+        body = _build_body(self._history + [question], self._config)
+        pieces = []
+        for chunk in self._client.generate_stream(self._model, body):
+            pieces.append(chunk.text)
+            yield chunk
+        self._remember(question, "".join(pieces))
+
+    def _remember(self, question: dict, answer: str):
+        """Add a question + answer pair to the history."""
+        self._history.append(question)
+        self._history.append({"role": "model", "parts": [{"text": answer}]})
+
+    def get_history(self) -> list:
+        """Everything said so far, as a list of JSON-style dicts."""
+        return list(self._history)
+
+
+class _Chats:
+    """client.chats - makes new conversations."""
+
+    def __init__(self, client: GeminiRestClient):
+        self._client = client
+
+    def create(self, model: str, config: dict = None,
+               history: list = None) -> GeminiRestChat:
+        return GeminiRestChat(self._client, model, config, history)
+
+
+class _Models:
+    """client.models - one-off questions with no conversation history."""
+
+    def __init__(self, client: GeminiRestClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str,
+                         config: dict = None) -> GeminiResponse:
+        body = _build_body([_user_content(contents)], config)
+        return self._client.generate(model, body)
+
+    def generate_content_stream(self, model: str, contents: str,
+                                config: dict = None):
+        body = _build_body([_user_content(contents)], config)
+        return self._client.generate_stream(model, body)
@@ -21,6 +21,8 @@ import time
 from RPLCD.i2c import CharLCD
 from gpiozero import LED, Button
 
+from snowy.lcd import LCD_COLS, wrap_lines
+
 
 # ---------------------------------------------------------------
 # EYE COLOURS
@@ -69,6 +71,11 @@ class SnowyBody:
         # Works with or without the external 10k resistor.
         self.ear = Button(18, pull_up=True)
 
+        # Remember what's on the LCD and which colour the eyes are,
+        # so main.py can save it in the snapshot (see snapshot.py)
+        self.face = ("", "")
+        self.eyes = "off"
+
         # Make sure all LEDs are off at startup - previous session may have
         # left them on (e.g. the sleepy/blue eyes from the shutdown sequence)
         self.set_eyes("off")
@@ -86,6 +93,7 @@ class SnowyBody:
                      "grumpy", "sleepy", "off"
         """
         colours = EYE_COLOURS.get(mood, EYE_COLOURS["off"])
+        self.eyes = mood if mood in EYE_COLOURS else "off"
         self.red.on()   if colours["red"]   else self.red.off()
         self.blue.on()  if colours["blue"]  else self.blue.off()
         self.green.on() if colours["green"] else self.green.off()
@@ -109,6 +117,7 @@ class SnowyBody:
         line1: top row    (max 16 characters)
         line2: bottom row (max 16 characters, optional)
         """
+        self.face = (line1[:16], line2[:16])
         self.lcd.clear()
         self.lcd.write_string(line1[:16])  # Trim to 16 chars just in case
         if line2:
@@ -127,26 +136,8 @@ class SnowyBody:
         text: the full message to display
         pause: how long (seconds) to show each page before scrolling
         """
-        # Step 1: split text into words
-        words = text.split()
-
-        # Step 2: pack words into 16-char LCD lines
-        lines = []
-        current_line = ""
-        for word in words:
-            # Will this word fit on the current line?
-            space_needed = len(word) + (1 if current_line else 0)
-            if len(current_line) + space_needed <= 16:
-                current_line += (" " if current_line else "") + word
-            else:
-                # Word doesn't fit - save current line, start new one
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
-
-        # Don't forget the last line!
-        if current_line:
-            lines.append(current_line)
+        # Steps 1 + 2: split into words and pack them into 16-char lines
+        lines = wrap_lines(text, LCD_COLS)
 
         # Step 3: show lines in pairs (2 lines = 1 page on the LCD)
         for i in range(0, len(lines), 2):
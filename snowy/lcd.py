@@ -0,0 +1,80 @@
+"""
+snowy/lcd.py - How much text fits on Snowy's face?
+
+Snowy's LCD is tiny: 2 rows of 16 characters. That's one "page".
+Long answers are shown a page at a time (see SnowyBody.scroll_text),
+so the number of pages tells us how long an answer takes to read.
+
+This file has no hardware code in it, so the brain can use it too:
+it works out how many pages an answer needs, and trims answers that
+are too long at the end of a sentence.
+"""
+
+import re
+
+LCD_COLS = 16   # characters per row
+LCD_ROWS = 2    # rows per page
+
+# A sentence ends with . ! or ? followed by a space (or the end)
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+def wrap_lines(text: str, width: int = LCD_COLS) -> list:
+    """
+    Pack words into lines of at most `width` characters,
+    like fitting words on a page.
+    """
+    lines = []
+    current_line = ""
+    for word in text.split():
+        # Will this word fit on the current line?
+        space_needed = len(word) + (1 if current_line else 0)
+        if len(current_line) + space_needed <= width:
+            current_line += (" " if current_line else "") + word
+        else:
+            # Word doesn't fit - save current line, start new one
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+
+    # Don't forget the last line!
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def count_pages(text: str) -> int:
+    """How many LCD pages this text needs."""
+    lines = wrap_lines(text)
+    return (len(lines) + LCD_ROWS - 1) // LCD_ROWS
+
+
+def fit_to_pages(text: str, pages: int, cut_off: bool = False) -> str:
+    """
+    Trim text so it fits on `pages` LCD pages, ending cleanly.
+
+    cut_off: True if the text was chopped mid-sentence (e.g. Gemini hit
+             its token limit) - then we drop the unfinished sentence.
+
+    Trimming happens at the end of a sentence when one fits. If not even
+    one sentence fits, we cut at a word and add "..." instead.
+    """
+    text = " ".join(text.split())
+    max_lines = pages * LCD_ROWS
+    lines = wrap_lines(text)
+    if len(lines) <= max_lines and not cut_off:
+        return text
+
+    # Keep only what fits on the pages...
+    kept = " ".join(lines[:max_lines])
+
+    # ...then go back to the last full stop (or ! or ?)
+    ends = [m.end() for m in _SENTENCE_END.finditer(kept)]
+    if ends:
+        return kept[:ends[-1]]
+
+    # No whole sentence fits - cut at a word and show "..."
+    words = kept.split()
+    while words and len(wrap_lines(" ".join(words) + "...")) > max_lines:
+        words.pop()
+    return " ".join(words) + "..."
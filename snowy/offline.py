@@ -0,0 +1,156 @@
+"""
+snowy/offline.py - Snowy's little offline brain!
+
+When the internet is down, or Gemini's free quota has run out for the
+day, Snowy can still answer lots of questions from a notebook of facts
+kept on the Pi itself: snowy/data/knowledge.json (animals, places,
+typical weather, science and more).
+
+How does she find the right answer? With a trick called TF-IDF:
+  - Every question in the notebook is broken into "features": its
+    important words, plus every 3-letter chunk of them ("snow" gives
+    "sno" and "now"). The chunks mean small mistakes still match -
+    "leapard" still looks a lot like "leopard"!
+  - Features that appear in only a few questions (like "cheetah") count
+    for a lot. Features that appear everywhere (like "ing") count for
+    very little.
+  - Your question is scored against every notebook question, and the
+    best match wins - if it's a good enough match.
+
+All the scoring numbers are worked out once when Snowy wakes up, so
+each question only takes a few milliseconds, even on a Pi 3B.
+
+Try it on its own:
+    python3 -m snowy.offline "how fast is a cheetah"
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+KNOWLEDGE_FILE = os.path.join(os.path.dirname(__file__), "data",
+                              "knowledge.json")
+
+# What Snowy says when nothing in her notebook matches
+NO_MATCH_ANSWER = ("My big brain is offline right now, but ask me about "
+                   "animals, places or the weather!")
+
+# Little words that appear in almost every question. They don't help
+# tell questions apart, so we skip them as whole-word features.
+STOP_WORDS = {
+    "a", "about", "an", "and", "are", "can", "do", "does", "for", "how",
+    "i", "in", "is", "it", "like", "me", "of", "on", "please", "so",
+    "tell", "the", "there", "to", "what", "whats", "when", "where",
+    "which", "who", "why", "you",
+}
+
+
+def _features(text: str) -> Counter:
+    """
+    Break text into features: important whole words ("w:cheetah") and
+    3-letter chunks of those words ("c: ch", "c:che", "c:hee", ...).
+    """
+    text = text.lower().replace("'", "")
+    words = re.findall(r"[a-z0-9]+", text)
+    features = Counter()
+    for word in words:
+        if word in STOP_WORDS:
+            continue
+        features["w:" + word] += 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += 1
+    return features
+
+
+class OfflineBrain:
+    """
+    Answers questions from Snowy's notebook of facts - no internet needed.
+
+    Usage:
+        offline = OfflineBrain()
+        answer, score = offline.find("how fast can cheetahs run")
+        print(offline.answer("where do polar bears live"))
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_FILE, min_score: float = 0.5):
+        # min_score: how close a match must be (0 = anything, 1 = exact)
+        self.min_score = min_score
+
+        with open(path) as f:
+            self.entries = json.load(f)
+
+        # Every phrasing of every question becomes one "document"
+        documents = []   # (entry number, features)
+        for number, entry in enumerate(self.entries):
+            for question in entry["questions"]:
+                documents.append((number, _features(question)))
+        self._doc_entry = [number for number, _ in documents]
+
+        # IDF: features found in fewer questions are worth more
+        counts = Counter()
+        for _, features in documents:
+            counts.update(features.keys())
+        total = len(documents)
+        self._idf = {feature: math.log((1 + total) / (1 + count)) + 1
+                     for feature, count in counts.items()}
+        # A feature the notebook has never seen is as rare as can be
+        self._unseen_idf = math.log(1 + total) + 1
+
+        # Inverted index: feature -> [(document number, weight), ...]
+        # so scoring only looks at documents that share a feature.
+        self._index = defaultdict(list)
+        for doc, (_, features) in enumerate(documents):
+            for feature, weight in self._vector(features).items():
+                self._index[feature].append((doc, weight))
+
+    def _vector(self, features: Counter) -> dict:
+        """Turn feature counts into TF-IDF weights of length 1."""
+        # Unknown features still count, so "capital of Peru" doesn't look
+        # just like "capital of France" when the notebook has no Peru.
+        vector = {}
+        for feature, count in features.items():
+            idf = self._idf.get(feature, self._unseen_idf)
+            vector[feature] = (1 + math.log(count)) * idf
+        length = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {feature: w / length for feature, w in vector.items()}
+
+    def find(self, question: str):
+        """
+        Find the best matching answer.
+
+        returns: (answer, score) - answer is None if nothing matched well
+        """
+        scores = defaultdict(float)
+        for feature, weight in self._vector(_features(question)).items():
+            for doc, doc_weight in self._index.get(feature, ()):
+                scores[doc] += weight * doc_weight
+
+        if not scores:
+            return None, 0.0
+        doc = max(scores, key=scores.get)
+        score = scores[doc]
+        if score < self.min_score:
+            return None, score
+        return self.entries[self._doc_entry[doc]]["answer"], score
+
+    def answer(self, question: str) -> str:
+        """Always returns something - a match, or a friendly 'offline' reply."""
+        answer, _ = self.find(question)
+        return answer or NO_MATCH_ANSWER
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    offline = OfflineBrain()
+    question = " ".join(sys.argv[1:]) or "how fast can a snow leopard run"
+    start = time.perf_counter()
+    answer, score = offline.find(question)
+    took_ms = (time.perf_counter() - start) * 1000
+    print(f"Q: {question}")
+    print(f"A: {answer or NO_MATCH_ANSWER}")
+    print(f"(score {score:.2f}, {took_ms:.1f} ms)")
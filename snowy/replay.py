@@ -0,0 +1,387 @@
+"""
+snowy/replay.py - Record Snowy's conversations, then play them back!
+
+Fixing a slow or broken answer used to mean standing next to the Pi and
+talking to it again and again. Now Snowy can RECORD a whole session:
+  - the microphone audio for every question
+  - what Google's speech recognition replied
+  - what Gemini replied (and how many tokens it used)
+  - how long every step took
+Everything is written to disk the moment it happens (one folder per
+session), so even if Snowy crashes, hangs or loses power, the session
+so far is safe. When Snowy shuts down normally, the folder is squashed
+into one small .zip file.
+
+Turn recording on by adding to your .env file:
+    SNOWY_RECORD=sessions          (a folder - one session each run)
+
+Then REPLAY a session on any Linux computer - no Pi, microphone or
+internet needed. The real SnowyEars and SnowyBrain code runs, fed from
+the recording, with a pretend body (FakeBody) instead of the LCD:
+
+    python3 -m snowy.replay sessions/session-20260101-093000.zip
+    python3 -m snowy.replay --realtime sessions/session-...zip
+    python3 -m snowy.replay sessions/session-20260101-093000   (a crashed
+                                                   session's folder works too)
+
+--realtime waits as long as the real session did (button presses,
+talking, Google's and Gemini's thinking time). Without it, everything
+runs as fast as possible - great for comparing a speed fix before and
+after ("A/B testing") on real questions.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+import speech_recognition as sr
+
+from snowy.answers import AnswerStore
+from snowy.audio import StreamEncoder
+from snowy.brain import SnowyBrain
+from snowy.ears import SnowyEars
+from snowy.gemini_rest import GeminiResponse
+
+# Replayed audio is fed to the encoder in chunks this many samples long,
+# the same size SpeechRecognition reads from the microphone.
+CHUNK_FRAMES = 1024
+
+
+# ---------------------------------------------------------------
+# RECORDING
+# ---------------------------------------------------------------
+
+class SessionRecorder:
+    """
+    Writes down everything that happens in a session.
+
+    Usage:
+        recorder = SessionRecorder("sessions/my-session")
+        ears.recorder = brain.recorder = recorder
+        ... use Snowy ...
+        recorder.close()    # squashes the folder into my-session.zip
+
+    Every event gets "t": seconds since the session started.
+
+    The folder holds events.jsonl (one line per event) and audio/NNNN.pcm
+    (one file per recording). Each is pushed to the SD card straight away
+    (fsync), so nothing piles up in memory and a crash loses nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._start = time.monotonic()
+        self._audio_count = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(path, "audio"), exist_ok=True)
+        self._events = open(os.path.join(path, "events.jsonl"), "a")
+
+    @classmethod
+    def in_folder(cls, folder: str) -> "SessionRecorder":
+        """Start a new recording in a folder, named after the time."""
+        name = time.strftime("session-%Y%m%d-%H%M%S")
+        return cls(os.path.join(folder, name))
+
+    def record(self, kind: str, audio: bytes = None, **data):
+        """
+        Write down one event, e.g. record("button") or
+        record("gemini", question="...", text="...", latency_s=0.8)
+        """
+        with self._lock:
+            event = {"t": round(time.monotonic() - self._start, 3),
+                     "kind": kind}
+            if audio is not None:
+                name = f"audio/{self._audio_count:04d}.pcm"
+                self._audio_count += 1
+                with open(os.path.join(self.path, name), "wb") as f:
+                    f.write(audio)
+                    f.flush()
+                    os.fsync(f.fileno())
+                event["audio"] = name
+            event.update(data)
+            self._events.write(json.dumps(event) + "\n")
+            self._events.flush()
+            os.fsync(self._events.fileno())
+
+    def close(self, squash: bool = True):
+        """
+        Stop recording. squash=True packs the folder into one .zip file
+        (made smaller with "deflate") and removes the folder.
+        """
+        with self._lock:
+            self._events.close()
+            if not squash:
+                print(f"Session recorded to {self.path}")
+                return
+            zip_path = self.path.rstrip(os.sep) + ".zip"
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+                for folder, _, files in os.walk(self.path):
+                    for file in sorted(files):
+                        full = os.path.join(folder, file)
+                        z.write(full, os.path.relpath(full, self.path))
+            shutil.rmtree(self.path)
+        print(f"Session recorded to {zip_path}")
+
+
+def load_session(path: str):
+    """
+    Read a recorded session - a .zip file, or a session folder (e.g.
+    one left behind when Snowy crashed).
+
+    returns: (events, audio) - the list of events, and a dict of
+             audio file name -> raw audio bytes
+    """
+    if os.path.isdir(path):
+        def read(name):
+            with open(os.path.join(path, name), "rb") as f:
+                return f.read()
+        names = ["audio/" + name
+                 for name in sorted(os.listdir(os.path.join(path, "audio")))]
+    else:
+        with zipfile.ZipFile(path) as z:
+            files = {name: z.read(name) for name in z.namelist()}
+        read = files.__getitem__
+        names = [name for name in files if name.startswith("audio/")]
+
+    events = []
+    for line in read("events.jsonl").decode().splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            pass   # a half-written line from a crash - skip it
+    audio = {name: read(name) for name in names}
+    return events, audio
+
+
+# ---------------------------------------------------------------
+# REPLAYING
+# ---------------------------------------------------------------
+
+class RecordedError(Exception):
+    """An error that happened in the recorded session, happening again."""
+
+
+class ReplayEars(SnowyEars):
+    """
+    SnowyEars, but the "microphone" and "Google" are the recording.
+    The real encoding and transcript-reading code still runs.
+    """
+
+    def __init__(self, events: list, audio: dict, realtime: bool = False):
+        # Don't call SnowyEars.__init__ - there's no microphone to open!
+        self.stream_encode = True
+        self.last_upload = None
+        self.recorder = None
+        self.realtime = realtime
+        self._audio = audio
+        self._listens = [e for e in events if e["kind"] == "listen"]
+        self._current = None
+
+    def _record_audio(self, timeout: float, phrase_limit: float):
+        event = self._current = self._listens.pop(0)
+        if event.get("timed_out"):
+            if self.realtime:
+                time.sleep(event["record_s"])
+            raise sr.WaitTimeoutError("replayed timeout")
+
+        raw = self._audio[event["audio"]]
+        encoder = StreamEncoder(event["sample_rate"], event["sample_width"])
+        chunk_size = CHUNK_FRAMES * event["sample_width"]
+        chunk_count = max(1, -(-len(raw) // chunk_size))
+        for i in range(0, len(raw), chunk_size):
+            encoder.feed(raw[i:i + chunk_size])
+            if self.realtime:
+                # Spread the recorded listening time across the chunks
+                time.sleep(event["record_s"] / chunk_count)
+        return encoder, []
+
+    def _upload(self, payload: bytes, content_type: str,
+                language: str = "en-US") -> str:
+        event = self._current
+        if self.realtime:
+            time.sleep(event["stt_s"])
+        if event.get("stt_error"):
+            raise sr.RequestError(event["stt_error"])
+        return event["stt_response"] or ""
+
+
+class ReplayClient:
+    """
+    Pretends to be a Gemini client, answering with the recorded replies.
+    Looks like the official library / gemini_rest (chats + models).
+    """
+
+    def __init__(self, events: list, realtime: bool = False):
+        self.realtime = realtime
+        self._replies = [e for e in events if e["kind"] == "gemini"]
+        self._lock = threading.Lock()
+        self.chats = self
+        self.models = self
+
+    def create(self, model: str, config=None, history=None):
+        return self     # one "chat" is enough for replaying
+
+    def send_message(self, message: str):
+        return self._reply(message)
+
+    def generate_content(self, model: str, contents: str, config=None):
+        return self._reply(contents)
+
+    def _reply(self, question: str):
+        with self._lock:
+            # Prefer the next reply to this exact question
+            reply = next((r for r in self._replies
+                          if r["question"] == question), None)
+            if reply is None:
+                raise RecordedError(f"no recorded Gemini reply for {question!r}")
+            self._replies.remove(reply)
+
+        if self.realtime:
+            time.sleep(reply["latency_s"])
+        if reply.get("error"):
+            raise RecordedError(reply["error"])
+        return GeminiResponse({
+            "candidates": [{
+                "content": {"parts": [{"text": reply["text"]}]},
+                "finishReason": reply["finish_reason"],
+            }],
+            "usageMetadata": {
+                "promptTokenCount": reply["input_tokens"],
+                "candidatesTokenCount": reply["output_tokens"],
+            },
+        })
+
+
+class FakeBody:
+    """
+    A pretend SnowyBody - prints to the terminal instead of the LCD.
+    Same methods as SnowyBody, so it can stand in for it anywhere.
+    """
+
+    def __init__(self, realtime: bool = False, verbose: bool = False):
+        self.realtime = realtime
+        self.verbose = verbose
+        self.face = ("", "")
+        self.eyes = "off"
+
+    def _sleep(self, seconds: float):
+        if self.realtime:
+            time.sleep(seconds)
+
+    def set_eyes(self, mood: str):
+        self.eyes = mood
+
+    def blink_eyes(self, mood: str, times: int = 3, speed: float = 0.2):
+        self._sleep(times * speed * 2)
+        self.eyes = mood
+
+    def show_face(self, line1: str, line2: str = ""):
+        self.face = (line1[:16], line2[:16])
+        if self.verbose:
+            print(f"  [LCD] {self.face[0]:16} | {self.face[1]}")
+
+    def scroll_text(self, text: str, pause: float = 2.5):
+        from snowy.lcd import wrap_lines
+        lines = wrap_lines(text)
+        for i in range(0, len(lines), 2):
+            self.show_face(lines[i], lines[i + 1] if i + 1 < len(lines) else "")
+            self._sleep(pause)
+
+    def wait_for_button(self, wait: float = 0.0):
+        """No real button - just wait as long as the recorded session did."""
+        self._sleep(wait)
+
+    def power_down(self):
+        self.face = ("", "")
+        self.eyes = "off"
+
+
+def replay(path: str, realtime: bool = False, verbose: bool = False) -> list:
+    """
+    Replay a recorded session through the real SnowyEars and SnowyBrain.
+
+    returns: one dict per question, with recorded vs replayed timings
+    """
+    events, audio = load_session(path)
+
+    ears = ReplayEars(events, audio, realtime=realtime)
+    body = FakeBody(realtime=realtime, verbose=verbose)
+    brain = SnowyBrain(backend="rest", client=ReplayClient(events, realtime))
+
+    # Use a notebook holding only the answers that came from the notebook
+    # in the recorded session, so the replay takes the same paths.
+    brain.store = AnswerStore(os.path.join(tempfile.mkdtemp(), "answers.json"))
+    thinks = [e for e in events if e["kind"] == "think"]
+    for event in thinks:
+        if event["source"] == "store":
+            brain.store.put(event["question"], event["answer"])
+
+    buttons = [e["t"] for e in events if e["kind"] == "button"]
+    results = []
+    replay_start = time.monotonic()
+    for number in range(len(ears._listens)):
+        # Press the "button" at the same moment as in the real session
+        if number < len(buttons):
+            now = time.monotonic() - replay_start
+            body.wait_for_button(max(0.0, buttons[number] - now))
+
+        start = time.monotonic()
+        question = ears.listen()
+        recorded_listen = ears._current
+        heard_s = time.monotonic() - start
+
+        result = {"question": question, "listen_s": heard_s,
+                  "recorded_listen_s": recorded_listen["record_s"]
+                  + recorded_listen.get("stt_s", 0.0),
+                  "think_s": None, "recorded_think_s": None, "source": None}
+        if question:
+            think_start = time.monotonic()
+            answer = brain.think(question)
+            result["think_s"] = time.monotonic() - think_start
+            result["source"] = brain.last_source
+            result["answer"] = answer
+            recorded = next((e for e in thinks if e["question"] == question),
+                            None)
+            if recorded:
+                thinks.remove(recorded)
+                result["recorded_think_s"] = recorded["think_s"]
+            body.scroll_text(answer)
+        results.append(result)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded Snowy session - no hardware needed.")
+    parser.add_argument("session",
+                        help="the recorded .zip file (or session folder)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="wait as long as the real session did")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show what the LCD would have shown")
+    args = parser.parse_args()
+
+    results = replay(args.session, realtime=args.realtime,
+                     verbose=args.verbose)
+
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+    print()
+    print(f"{'question':32} {'source':8} {'listen ms':>15} {'think ms':>15}")
+    print(f"{'':32} {'':8} {'(was)':>7} {'now':>7} {'(was)':>7} {'now':>7}")
+    for r in results:
+        print(f"{(r['question'] or '(nothing heard)')[:32]:32} "
+              f"{r['source'] or '-':8} "
+              f"{ms(r['recorded_listen_s']):>7} {ms(r['listen_s']):>7} "
+              f"{ms(r['recorded_think_s']):>7} {ms(r['think_s']):>7}")
+
+
+if __name__ == "__main__":
+    main()
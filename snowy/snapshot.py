@@ -0,0 +1,181 @@
+"""
+snowy/snapshot.py - Snowy remembers where she was, even after a crash!
+
+Starting Snowy from cold takes a while: she calibrates the microphone,
+checks her Gemini credits, says hello... and forgets the conversation.
+That's fine in the morning, but annoying if she crashed (or systemd
+restarted her) ten seconds ago.
+
+So while Snowy runs, she writes little notes into a snapshot file:
+  - each question + answer in the conversation
+  - the background-noise level her ears learned
+  - whether her Gemini credits were OK
+  - what was on her LCD face and which colour her eyes were
+
+Each note is ONE line of JSON added to the end of the file, written in
+one go and pushed to the SD card straight away (fsync). If the power is
+cut mid-note, only that last half-written line is lost - everything
+before it is safe, and loading simply skips the broken line.
+
+On restart, if the snapshot is fresh (a few minutes old, and written
+since the Pi last booted), main.py skips
+calibration, the credits check and the greeting, and puts the
+conversation back - so Snowy is ready in well under a second.
+
+The file is snowy_snapshot.jsonl in the Snowy folder (change it with
+SNOWY_SNAPSHOT=/some/other/file.jsonl in your .env file).
+"""
+
+import json
+import os
+import time
+
+# A snapshot older than this is "stale" - do a normal cold start instead
+FRESH_SECONDS = 15 * 60
+
+# Only keep this many question + answer turns of conversation
+MAX_TURNS = 20
+
+# Linux makes up a new random id every time the computer boots
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+
+
+def _boot_id() -> str:
+    """This boot's id, or None if we can't tell (e.g. not Linux)."""
+    try:
+        with open(BOOT_ID_FILE) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class Snapshot:
+    """
+    Reads and writes Snowy's snapshot file.
+
+    Usage:
+        snapshot = Snapshot()
+        state = snapshot.load()
+        if snapshot.is_fresh(state):
+            ...restore from state...
+        snapshot.save_turn("What do you eat?", "Blue sheep!")
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("SNOWY_SNAPSHOT",
+                                           "snowy_snapshot.jsonl")
+        self._fd = None
+        self._last = {}   # last note of each kind, to skip repeats
+        self._boot = _boot_id()
+
+    def load(self) -> dict:
+        """
+        Read the snapshot and work out Snowy's last state.
+
+        returns: {"turns": [[question, answer], ...], "noise": float/None,
+                  "quota_ok": True/False/None, "display": dict/None,
+                  "saved": time of the last note (0 if none),
+                  "boot": boot id when the last note was written}
+        """
+        state = {"turns": [], "noise": None, "quota_ok": None,
+                 "display": None, "saved": 0, "boot": None}
+        if not os.path.exists(self.path):
+            return state
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    note = json.loads(line)
+                except ValueError:
+                    continue   # a half-written line from a crash - skip it
+                kind = note.get("kind")
+                if kind == "turn":
+                    state["turns"].append([note["question"], note["answer"]])
+                elif kind == "noise":
+                    state["noise"] = note["threshold"]
+                elif kind == "quota":
+                    state["quota_ok"] = note["ok"]
+                elif kind == "display":
+                    state["display"] = {"line1": note["line1"],
+                                        "line2": note["line2"],
+                                        "eyes": note["eyes"]}
+                state["saved"] = max(state["saved"], note.get("t", 0))
+                state["boot"] = note.get("boot")
+
+        state["turns"] = state["turns"][-MAX_TURNS:]
+        return state
+
+    def is_fresh(self, state: dict, max_age: float = FRESH_SECONDS) -> bool:
+        """
+        True if the snapshot is recent AND has everything a warm restart
+        needs (the noise level and the credits state).
+
+        A Pi has no clock battery: after a power cut it starts with the
+        time it last saved (fake-hwclock) until the internet fixes it. So
+        the time alone can make an old snapshot look new - that's why it
+        must also come from this same boot, and can't be "from the future".
+        """
+        age = time.time() - state["saved"]
+        return (0 <= age < max_age
+                and state["boot"] == _boot_id()
+                and state["noise"] is not None
+                and state["quota_ok"] is not None)
+
+    def _append(self, kind: str, **data):
+        """
+        Add one note to the end of the file.
+        One os.write() per line + fsync = crash-safe.
+        """
+        if self._last.get(kind) == data and kind != "turn":
+            return   # nothing changed - don't wear out the SD card
+        self._last[kind] = data
+
+        if self._fd is None:
+            self._fd = os.open(self.path,
+                               os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        note = dict({"t": time.time(), "boot": self._boot, "kind": kind},
+                    **data)
+        os.write(self._fd, (json.dumps(note) + "\n").encode("utf-8"))
+        os.fsync(self._fd)
+
+    def save_turn(self, question: str, answer: str):
+        self._append("turn", question=question, answer=answer)
+
+    def save_noise(self, threshold: float):
+        self._append("noise", threshold=round(threshold, 1))
+
+    def save_quota(self, ok: bool):
+        self._append("quota", ok=ok)
+
+    def save_display(self, line1: str, line2: str, eyes: str):
+        self._append("display", line1=line1, line2=line2, eyes=eyes)
+
+    def compact(self, state: dict):
+        """
+        Rewrite the snapshot with just the current state, so the file
+        doesn't grow forever (and any half-written line is tidied away).
+
+        The new file is written next to the old one, then swapped in with
+        os.replace() - so there is always one complete snapshot on disk.
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._last = {}
+
+        stamp = {"t": time.time(), "boot": self._boot}
+        notes = [dict(stamp, kind="turn", question=q, answer=a)
+                 for q, a in state["turns"][-MAX_TURNS:]]
+        if state["noise"] is not None:
+            notes.append(dict(stamp, kind="noise", threshold=state["noise"]))
+        if state["quota_ok"] is not None:
+            notes.append(dict(stamp, kind="quota", ok=state["quota_ok"]))
+        if state["display"] is not None:
+            notes.append(dict(stamp, kind="display", **state["display"]))
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("".join(json.dumps(note) + "\n" for note in notes))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
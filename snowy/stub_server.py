@@ -0,0 +1,167 @@
+"""
+snowy/stub_server.py - A pretend Gemini that runs on your own computer!
+
+This little web server answers questions the same way Gemini's
+"generateContent" API does, but instantly, for free, and without the
+internet. It's handy for testing Snowy's brain on any computer:
+
+    python3 -m snowy.stub_server --port 8765
+
+Then point Snowy at it by adding to your .env file:
+    GEMINI_BASE_URL=http://127.0.0.1:8765
+
+It can also pretend to be slow (--delay) or out of quota (--exhausted),
+so you can see how Snowy copes.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_answer(question: str) -> str:
+    """The default pretend answer - repeats the question back."""
+    return f"You asked: {question}. Snow leopards know lots! *purr*"
+
+
+def _reply(text: str) -> dict:
+    """Build a Gemini-shaped JSON reply. Tokens are roughly words here."""
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP",
+        }],
+        "usageMetadata": {
+            "candidatesTokenCount": len(text.split()),
+        },
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles one request to the pretend Gemini."""
+
+    # HTTP/1.1 keeps connections open between requests, like real Gemini
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # send small replies straight away
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        with stub.lock:
+            stub.requests += 1
+
+        if stub.exhausted:
+            self._send_json(429, {"error": {
+                "code": 429,
+                "message": "You exceeded your current quota (stub).",
+                "status": "RESOURCE_EXHAUSTED",
+            }})
+            return
+
+        if stub.delay:
+            time.sleep(stub.delay)
+
+        # The question is the last thing the user said
+        question = ""
+        for content in body.get("contents", []):
+            if content.get("role", "user") == "user":
+                question = "".join(p.get("text", "")
+                                   for p in content.get("parts", []))
+        answer = stub.answer(question)
+        prompt_tokens = sum(
+            len(p.get("text", "").split())
+            for c in body.get("contents", []) for p in c.get("parts", []))
+
+        if ":streamGenerateContent" in self.path:
+            # Streamed replies come as "server-sent events", a few words each
+            words = answer.split(" ")
+            events = []
+            for i in range(0, len(words), 4):
+                piece = " ".join(words[i:i + 4])
+                piece += " " if i + 4 < len(words) else ""
+                chunk = _reply(piece)
+                chunk["usageMetadata"]["promptTokenCount"] = prompt_tokens
+                events.append(b"data: " + json.dumps(chunk).encode() + b"\r\n\r\n")
+            self._send(200, "text/event-stream", b"".join(events))
+        else:
+            reply = _reply(answer)
+            reply["usageMetadata"]["promptTokenCount"] = prompt_tokens
+            self._send_json(200, reply)
+
+    def _send_json(self, code: int, data: dict):
+        self._send(code, "application/json", json.dumps(data).encode())
+
+    def _send(self, code: int, content_type: str, payload: bytes):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Keep the terminal quiet
+
+
+class StubGemini:
+    """
+    Runs the pretend Gemini in a background thread.
+
+    Usage:
+        stub = StubGemini()
+        url = stub.start()     # e.g. "http://127.0.0.1:54321"
+        ... point SnowyBrain at url ...
+        stub.stop()
+
+    answer:    function that turns a question into an answer
+    delay:     seconds to wait before answering (pretend thinking time)
+    exhausted: True = reply to everything with a 429 quota error
+    """
+
+    def __init__(self, port: int = 0, answer=stub_answer,
+                 delay: float = 0.0, exhausted: bool = False):
+        self.answer = answer
+        self.delay = delay
+        self.exhausted = exhausted
+        self.requests = 0      # how many requests we've answered
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """Start answering in the background. Returns the base URL."""
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pretend Gemini server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="seconds to wait before each answer")
+    parser.add_argument("--exhausted", action="store_true",
+                        help="reply with 429 quota errors")
+    args = parser.parse_args()
+
+    stub = StubGemini(port=args.port, delay=args.delay,
+                      exhausted=args.exhausted)
+    print(f"Pretend Gemini listening on {stub.url} (Ctrl+C to stop)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,97 @@
+"""
+Compare Snowy's two brain backends: google-genai ("sdk") vs our tiny
+REST client ("rest").
+
+For each backend this starts a FRESH Python (so nothing is already
+loaded) and measures:
+  - import time        how long loading the Gemini library takes
+  - first request      making SnowyBrain + asking one question
+  - second request     asking again on the kept-alive connection
+  - peak memory (RSS)  how much RAM the whole process used
+
+No internet or API key needed - it talks to the pretend Gemini in
+snowy/stub_server.py. Run from the Snowy folder:
+
+    python3 tests/brain_bench.py
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from snowy.stub_server import StubGemini
+
+REPEATS = 3
+
+# This runs inside the fresh Python for each measurement
+CHILD = """
+import json, resource, sys, time
+backend = sys.argv[1]
+t0 = time.perf_counter()
+if backend == "sdk":
+    from google import genai
+else:
+    import snowy.gemini_rest
+t1 = time.perf_counter()
+from snowy.brain import SnowyBrain
+brain = SnowyBrain(backend=backend)
+brain.think("How fast can a snow leopard run?")
+t2 = time.perf_counter()
+brain.think("And how far can it jump?")
+t3 = time.perf_counter()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+print(json.dumps({"import": t1 - t0, "first": t2 - t1,
+                  "second": t3 - t2, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def run_once(backend: str, url: str) -> dict:
+    """Measure one backend once, in a brand new Python process."""
+    # An empty notebook, so a question answered by "batch --warm" is
+    # still sent to the (pretend) Gemini and actually timed
+    answers = os.path.join(tempfile.mkdtemp(), "answers.json")
+    env = dict(os.environ, GEMINI_API_KEY="stub", GEMINI_BASE_URL=url,
+               SNOWY_ANSWERS=answers)
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, backend],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    # The measurements are the last line (SnowyBrain prints a greeting)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    stub = StubGemini()
+    url = stub.start()
+    print(f"Pretend Gemini running at {url}\n")
+
+    print(f"{'backend':8} {'import':>9} {'1st req':>9} {'2nd req':>9} {'RSS':>8}")
+    for backend in ("sdk", "rest"):
+        try:
+            runs = [run_once(backend, url) for _ in range(REPEATS)]
+        except RuntimeError as err:
+            print(f"{backend:8} skipped: {err}")
+            continue
+
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+
+        print(f"{backend:8} {median('import') * 1000:7.0f}ms "
+              f"{median('first') * 1000:7.0f}ms "
+              f"{median('second') * 1000:7.0f}ms "
+              f"{median('rss_mb'):6.1f}MB")
+
+    print(f"\n(median of {REPEATS} runs each)")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()